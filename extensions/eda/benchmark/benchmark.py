@@ -0,0 +1,436 @@
+"""benchmark.py.
+
+Benchmark suite for the eventstream event source plugin.
+
+Each scenario starts the Falcon stand-in server (falcon_stub.py) in a separate
+process, drives the plugin's main() against it with an asyncio.Queue the way
+ansible-rulebook does, and reports:
+
+    events/sec  Events received by the queue per second
+    p50/p99     End-to-end latency, from the stub sending an event to the
+                event being taken from the queue, in milliseconds
+    RSS         Peak resident memory of the process running the plugin
+
+Every scenario runs in its own process so peak memory is not shared between
+scenarios.
+
+Examples:
+--------
+  # Run every scenario
+  python benchmark.py
+
+  # Record a baseline, then fail if a later run is more than 20% worse
+  python benchmark.py --save baseline.json
+  python benchmark.py --compare baseline.json --tolerance 0.2
+
+  # Run a single scenario with extra plugin arguments
+  python benchmark.py --scenario burst --plugin-args '{"decode_thread_threshold": 500}'
+
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import resource
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Optional
+from urllib.error import URLError
+from urllib.request import urlopen
+
+HERE = Path(__file__).resolve().parent
+PLUGIN = HERE.parent / "plugins" / "event_source" / "eventstream.py"
+STUB = HERE / "falcon_stub.py"
+
+# Scenario: stub arguments, plugin arguments and the number of expected events
+SCENARIOS: dict[str, dict[str, Any]] = {
+    "burst": {
+        "description": "4 partitions sending 50000 events each as fast as possible",
+        "stub": ["--partitions", "4", "--events", "50000"],
+        "plugin": {},
+        "expected": 200000,
+    },
+    "steady": {
+        "description": "2 partitions sending 2000 events per second each",
+        "stub": ["--partitions", "2", "--events", "20000", "--rate", "2000"],
+        "plugin": {},
+        "expected": 40000,
+    },
+    "filtered": {
+        "description": "4 partitions where 3 event types out of 4 are excluded",
+        "stub": ["--partitions", "4", "--events", "50000"],
+        "plugin": {
+            "exclude_event_types": [
+                "AuthActivityAuditEvent",
+                "UserActivityAuditEvent",
+                "IncidentSummaryEvent",
+            ],
+        },
+        "expected": 50000,
+    },
+    "disconnects": {
+        "description": "2 partitions dropping the connection every 5000 events",
+        "stub": ["--partitions", "2", "--events", "20000", "--disconnect-after", "5000"],
+        "plugin": {"reconnect_max_backoff": 1},
+        "expected": 40000,
+    },
+}
+
+
+def free_port() -> int:
+    """Return a free TCP port on the loopback interface.
+
+    Returns
+    -------
+    int
+        The port.
+
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(stub_args: list[str], port: int, timeout: float = 10) -> subprocess.Popen:
+    """Start the stand-in server and wait until it accepts requests.
+
+    Parameters
+    ----------
+    stub_args: list[str]
+        The arguments of falcon_stub.py.
+    port: int
+        The port to listen on.
+    timeout: float
+        The number of seconds to wait for the server.
+
+    Returns
+    -------
+    subprocess.Popen
+        The server process.
+
+    Raises
+    ------
+    RuntimeError
+        If the server did not start in time.
+
+    """
+    process = subprocess.Popen(  # noqa: S603
+        [sys.executable, str(STUB), "--port", str(port), *stub_args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(f"http://127.0.0.1:{port}/stats", timeout=1):
+                return process
+        except (URLError, OSError):
+            time.sleep(0.1)
+    process.kill()
+    msg = "The stand-in server did not start"
+    raise RuntimeError(msg)
+
+
+def load_plugin() -> ModuleType:
+    """Load the eventstream plugin from the source tree.
+
+    Returns
+    -------
+    ModuleType
+        The plugin module.
+
+    """
+    spec = importlib.util.spec_from_file_location("eventstream", PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return a percentile of a list of values.
+
+    Parameters
+    ----------
+    values: list[float]
+        The values, in any order.
+    fraction: float
+        The percentile, between 0 and 1.
+
+    Returns
+    -------
+    float
+        The value at the percentile, or 0 if there are no values.
+
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def drive(
+    plugin: ModuleType,
+    port: int,
+    plugin_args: dict[str, Any],
+    expected: int,
+    duration: float,
+) -> dict[str, Any]:
+    """Run the plugin against the stand-in server until every event is received.
+
+    Parameters
+    ----------
+    plugin: ModuleType
+        The plugin module.
+    port: int
+        The port of the stand-in server.
+    plugin_args: dict[str, Any]
+        The plugin arguments added to the defaults.
+    expected: int
+        The number of events to receive.
+    duration: float
+        The maximum number of seconds to run for.
+
+    Returns
+    -------
+    dict[str, Any]
+        The results.
+
+    """
+    plugin.REGIONS["benchmark"] = f"http://127.0.0.1:{port}"
+    args = {
+        "falcon_client_id": "benchmark",
+        "falcon_client_secret": "benchmark",
+        "falcon_cloud": "benchmark",
+        "stream_name": "benchmark",
+        **plugin_args,
+    }
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(plugin.main(queue, args))
+
+    latencies: list[float] = []
+    received = 0
+    started = time.monotonic()
+    first: Optional[float] = None
+    last = started
+    try:
+        while received < expected and time.monotonic() - started < duration:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=1)
+            except asyncio.TimeoutError:
+                if task.done():
+                    break
+                continue
+            last = time.monotonic()
+            first = first or last
+            received += 1
+            sent_at = event["falcon"].get("event", {}).get("StubSentAt")
+            if sent_at:
+                latencies.append(time.time() - sent_at)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    elapsed = last - (first or started)
+    return {
+        "events": received,
+        "expected": expected,
+        "seconds": round(elapsed, 3),
+        "events_per_sec": round(received / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        # ru_maxrss is reported in kilobytes on Linux
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_scenario(name: str, plugin_args: dict[str, Any], timeout: float) -> dict[str, Any]:
+    """Run a single scenario in the current process.
+
+    Parameters
+    ----------
+    name: str
+        The name of the scenario.
+    plugin_args: dict[str, Any]
+        Extra plugin arguments, overriding the scenario's.
+    timeout: float
+        The maximum number of seconds to run for.
+
+    Returns
+    -------
+    dict[str, Any]
+        The results.
+
+    """
+    scenario = SCENARIOS[name]
+    port = free_port()
+    stub = start_stub(scenario["stub"], port)
+    try:
+        return asyncio.run(
+            drive(
+                load_plugin(),
+                port,
+                {**scenario["plugin"], **plugin_args},
+                scenario["expected"],
+                timeout,
+            ),
+        )
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+def run_isolated(name: str, plugin_args: dict[str, Any], timeout: float) -> dict[str, Any]:
+    """Run a single scenario in a new process.
+
+    Parameters
+    ----------
+    name: str
+        The name of the scenario.
+    plugin_args: dict[str, Any]
+        Extra plugin arguments, overriding the scenario's.
+    timeout: float
+        The maximum number of seconds to run for.
+
+    Returns
+    -------
+    dict[str, Any]
+        The results.
+
+    """
+    output = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            __file__,
+            "--scenario",
+            name,
+            "--plugin-args",
+            json.dumps(plugin_args),
+            "--timeout",
+            str(timeout),
+            "--json",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(output.stdout)[name]
+
+
+def compare(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    tolerance: float,
+) -> list[str]:
+    """Compare results with a baseline.
+
+    Parameters
+    ----------
+    results: dict[str, dict[str, Any]]
+        The results of this run, per scenario.
+    baseline: dict[str, dict[str, Any]]
+        The results of the baseline run, per scenario.
+    tolerance: float
+        The allowed relative regression, e.g. 0.2 for 20%.
+
+    Returns
+    -------
+    list[str]
+        A description of each regression.
+
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["events"] < result["expected"]:
+            regressions.append(f"{name}: received {result['events']} of {result['expected']} events")
+        if result["events_per_sec"] < base["events_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['events_per_sec']} events/sec, baseline {base['events_per_sec']}",
+            )
+        for metric in ("p99_ms", "rss_mb"):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {result[metric]}, baseline {base[metric]}")
+    return regressions
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments.
+
+    Parameters
+    ----------
+    argv: Optional[list[str]]
+        The arguments. Defaults to sys.argv.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed arguments.
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="defaults to every scenario")
+    parser.add_argument("--plugin-args", default="{}", help="JSON object of extra plugin arguments")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per scenario")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--compare", help="fail if the results regress from this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the benchmark suite.
+
+    Parameters
+    ----------
+    argv: Optional[list[str]]
+        The arguments. Defaults to sys.argv.
+
+    Returns
+    -------
+    int
+        The exit status, 1 if a regression was found.
+
+    """
+    args = parse_args(argv)
+    plugin_args = json.loads(args.plugin_args)
+    names = args.scenario or list(SCENARIOS)
+
+    results = {}
+    for name in names:
+        if len(names) == 1:
+            results[name] = run_scenario(name, plugin_args, args.timeout)
+        else:
+            results[name] = run_isolated(name, plugin_args, args.timeout)
+
+    if args.json:
+        print(json.dumps(results))  # noqa: T201
+    else:
+        print(f"{'scenario':<12} {'events':>8} {'events/sec':>11} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")  # noqa: T201
+        for name, result in results.items():
+            print(  # noqa: T201
+                f"{name:<12} {result['events']:>8} {result['events_per_sec']:>11} "
+                f"{result['p50_ms']:>8} {result['p99_ms']:>8} {result['rss_mb']:>7}",
+            )
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)  # noqa: T201
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""falcon_stub.py.
+
+A local stand-in for the CrowdStrike Falcon Event Stream API, used to load test
+the eventstream event source plugin without a Falcon tenant.
+
+It implements the endpoints used by the plugin:
+
+    POST /oauth2/token
+    GET  /sensors/entities/datafeed/v2
+    POST /sensors/entities/datafeed-actions/v1/{partition}
+    GET  /sensors/entities/datafeed/v1/stream  (chunked NDJSON data feed)
+
+Events are either synthetic or replayed from a recorded NDJSON file, and are
+sent across any number of partitions at a configurable rate. Connections can be
+dropped after a number of events to exercise reconnection.
+
+Each event carries its send time in ``event.StubSentAt`` (seconds since the
+epoch) so the end-to-end latency can be measured by the consumer.
+
+Examples:
+--------
+  # 4 partitions of 100000 events each, as fast as possible
+  python falcon_stub.py --partitions 4 --events 100000
+
+  # Replay recorded events at 500 events per second per partition, dropping
+  # every connection after 1000 events
+  python falcon_stub.py --replay events.ndjson --rate 500 --disconnect-after 1000
+
+The plugin only connects to the Falcon clouds listed in its REGIONS mapping;
+benchmark.py adds the stand-in server to it before calling main().
+
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger("falcon_stub")
+
+EVENT_TYPES = (
+    "DetectionSummaryEvent",
+    "AuthActivityAuditEvent",
+    "UserActivityAuditEvent",
+    "IncidentSummaryEvent",
+)
+
+
+class FalconStub:
+    """Serve synthetic or recorded events over a Falcon compatible data feed."""
+
+    ACCESS_TOKEN = "stub-access-token"  # noqa: S105
+    # Seconds between keep-alive newlines once every event has been sent
+    IDLE_HEARTBEAT = 5
+
+    def __init__(
+        self: "FalconStub",
+        *,
+        partitions: int = 1,
+        events: int = 0,
+        rate: float = 0,
+        batch: int = 100,
+        disconnect_after: int = 0,
+        refresh_interval: int = 1800,
+        replay: Optional[str] = None,
+    ) -> None:
+        """Initialize a new FalconStub object.
+
+        Parameters
+        ----------
+        partitions: int
+            The number of stream partitions.
+        events: int
+            The number of events available in each partition. 0 is unlimited.
+        rate: float
+            The number of events per second sent on each partition. 0 is unlimited.
+        batch: int
+            The maximum number of events written in a single chunk.
+        disconnect_after: int
+            Close each connection after sending this many events. 0 disables.
+        refresh_interval: int
+            The refreshActiveSessionInterval advertised for each partition.
+        replay: Optional[str]
+            The path of an NDJSON file of recorded events to replay in a loop.
+
+        """
+        self.partitions: int = partitions
+        self.events: int = events
+        self.rate: float = rate
+        self.batch: int = max(batch, 1)
+        self.disconnect_after: int = disconnect_after
+        self.refresh_interval: int = refresh_interval
+        self.records: list[dict[str, Any]] = self.load_records(replay) if replay else []
+        # Partition: next offset that has not been produced yet
+        self.heads: dict[int, int] = dict.fromkeys(range(partitions), 0)
+        self.stats: dict[str, int] = {
+            "tokens": 0,
+            "listings": 0,
+            "refreshes": 0,
+            "connections": 0,
+            "disconnects": 0,
+            "events": 0,
+        }
+
+    @staticmethod
+    def load_records(path: str) -> list[dict[str, Any]]:
+        """Load recorded events from an NDJSON file.
+
+        Lines may hold either raw events or events wrapped in a "falcon" key, as
+        received by a rulebook.
+
+        Parameters
+        ----------
+        path: str
+            The path of the file.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The recorded events.
+
+        Raises
+        ------
+        ValueError
+            If the file does not contain any event.
+
+        """
+        records = []
+        with Path(path).open(encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                records.append(record.get("falcon", record))
+        if not records:
+            msg = f"No events found in {path}"
+            raise ValueError(msg)
+        return records
+
+    def make_event(self: "FalconStub", partition: int, offset: int) -> dict[str, Any]:
+        """Build the event found at an offset of a partition.
+
+        Parameters
+        ----------
+        partition: int
+            The partition of the event.
+        offset: int
+            The offset of the event.
+
+        Returns
+        -------
+        dict[str, Any]
+            The event.
+
+        """
+        now = time.time()
+        if self.records:
+            record = self.records[offset % len(self.records)]
+            event = dict(record)
+            event["metadata"] = dict(record.get("metadata", {}))
+            event["event"] = dict(record.get("event", {}))
+        else:
+            event = {
+                "metadata": {
+                    "customerIDString": "0123456789abcdef0123456789abcdef",
+                    "eventType": EVENT_TYPES[offset % len(EVENT_TYPES)],
+                    "version": "1.0",
+                },
+                "event": {
+                    "CompositeId": f"stub:{partition}:{offset // 10}",
+                    "Severity": offset % 5 + 1,
+                    "Hostname": f"host-{offset % 1000}",
+                    "CommandLine": "C:\\Windows\\System32\\cmd.exe /c whoami",
+                },
+            }
+        event["metadata"]["offset"] = offset
+        event["metadata"]["eventCreationTime"] = int(now * 1000)
+        event["event"]["StubSentAt"] = now
+        return event
+
+    def app(self: "FalconStub") -> web.Application:
+        """Create the web application serving the API.
+
+        Returns
+        -------
+        web.Application
+            The application.
+
+        """
+        app = web.Application()
+        app.router.add_post("/oauth2/token", self.token)
+        app.router.add_get("/sensors/entities/datafeed/v2", self.list_streams)
+        app.router.add_post(
+            "/sensors/entities/datafeed-actions/v1/{partition}",
+            self.refresh,
+        )
+        app.router.add_get("/sensors/entities/datafeed/v1/stream", self.feed)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+    async def token(self: "FalconStub", _request: web.Request) -> web.Response:
+        """Issue an access token for any credentials.
+
+        Parameters
+        ----------
+        _request: web.Request
+            The request.
+
+        Returns
+        -------
+        web.Response
+            The token response.
+
+        """
+        self.stats["tokens"] += 1
+        return web.json_response(
+            {"access_token": self.ACCESS_TOKEN, "token_type": "bearer", "expires_in": 1799},
+            status=201,
+        )
+
+    async def list_streams(self: "FalconStub", request: web.Request) -> web.Response:
+        """List one stream resource per partition.
+
+        Parameters
+        ----------
+        request: web.Request
+            The request.
+
+        Returns
+        -------
+        web.Response
+            The stream resources.
+
+        """
+        self.stats["listings"] += 1
+        app_id = request.query.get("appId", "")
+        base = f"{request.scheme}://{request.host}"
+        resources = [
+            {
+                "dataFeedURL": f"{base}/sensors/entities/datafeed/v1/stream?appId={app_id}&partition={partition}",
+                "sessionToken": {
+                    "token": f"session-{partition}",
+                    "expiration": "2099-01-01T00:00:00Z",
+                },
+                "refreshActiveSessionURL": f"{base}/sensors/entities/datafeed-actions/v1/{partition}",
+                "refreshActiveSessionInterval": self.refresh_interval,
+            }
+            for partition in range(self.partitions)
+        ]
+        return web.json_response({"meta": {}, "resources": resources, "errors": []})
+
+    async def refresh(self: "FalconStub", request: web.Request) -> web.Response:
+        """Refresh the session of a partition.
+
+        Parameters
+        ----------
+        request: web.Request
+            The request.
+
+        Returns
+        -------
+        web.Response
+            An empty response.
+
+        """
+        if request.headers.get("Authorization") != f"Bearer {self.ACCESS_TOKEN}":
+            return web.json_response({"errors": [{"message": "access denied"}]}, status=401)
+        self.stats["refreshes"] += 1
+        return web.json_response({"meta": {}, "resources": [], "errors": []})
+
+    async def get_stats(self: "FalconStub", _request: web.Request) -> web.Response:
+        """Return the request counters of the server.
+
+        Parameters
+        ----------
+        _request: web.Request
+            The request.
+
+        Returns
+        -------
+        web.Response
+            The counters.
+
+        """
+        return web.json_response(self.stats)
+
+    async def feed(self: "FalconStub", request: web.Request) -> web.StreamResponse:
+        """Stream the events of a partition as chunked NDJSON.
+
+        Parameters
+        ----------
+        request: web.Request
+            The request.
+
+        Returns
+        -------
+        web.StreamResponse
+            The data feed.
+
+        """
+        partition = int(request.query.get("partition", 0))
+        if request.headers.get("Authorization") != f"Token session-{partition}":
+            return web.json_response({"errors": [{"message": "invalid session"}]}, status=401)
+
+        if request.query.get("whence") == "2":
+            offset = self.heads[partition]
+        else:
+            offset = int(request.query.get("offset", 0))
+        event_types = set(filter(None, request.query.get("eventType", "").split(",")))
+
+        self.stats["connections"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+
+        started = time.monotonic()
+        sent = 0
+        for current in itertools.count(offset):
+            if self.events and current >= self.events:
+                # Every event was sent, keep the connection open like the API does
+                while True:
+                    await response.write(b"\n")
+                    await asyncio.sleep(self.IDLE_HEARTBEAT)
+            if self.rate:
+                # Wait until the event is due according to the rate
+                delay = started + sent / self.rate - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            event = self.make_event(partition, current)
+            self.heads[partition] = max(self.heads[partition], current + 1)
+            if event_types and event["metadata"]["eventType"] not in event_types:
+                continue
+            sent += 1
+            self.stats["events"] += 1
+            await response.write(json.dumps(event).encode() + b"\n")
+            if sent % self.batch == 0:
+                # Let other partitions write in between batches
+                await asyncio.sleep(0)
+            if self.disconnect_after and sent >= self.disconnect_after:
+                self.stats["disconnects"] += 1
+                logger.info("Dropping partition %d connection at offset %d", partition, current)
+                break
+        return response
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments.
+
+    Parameters
+    ----------
+    argv: Optional[list[str]]
+        The arguments. Defaults to sys.argv.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed arguments.
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--partitions", type=int, default=1)
+    parser.add_argument("--events", type=int, default=0, help="events per partition, 0 is unlimited")
+    parser.add_argument("--rate", type=float, default=0, help="events per second per partition")
+    parser.add_argument("--batch", type=int, default=100, help="events per chunk")
+    parser.add_argument("--disconnect-after", type=int, default=0, help="events per connection")
+    parser.add_argument("--refresh-interval", type=int, default=1800)
+    parser.add_argument("--replay", help="NDJSON file of recorded events")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the stand-in server until interrupted.
+
+    Parameters
+    ----------
+    argv: Optional[list[str]]
+        The arguments. Defaults to sys.argv.
+
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stub = FalconStub(
+        partitions=args.partitions,
+        events=args.events,
+        rate=args.rate,
+        batch=args.batch,
+        disconnect_after=args.disconnect_after,
+        refresh_interval=args.refresh_interval,
+        replay=args.replay,
+    )
+    web.run_app(stub.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
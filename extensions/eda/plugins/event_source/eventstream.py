@@ -14,11 +14,73 @@ Arguments:
                             Default: us-1
     stream_name:            Label that identifies your connection.
                             Max: 32 alphanumeric characters. Default: eda
+    tenants:                List of tenants to stream from, each a dict with any of
+                            falcon_client_id, falcon_client_secret, falcon_cloud,
+                            member_cid (Flight Control child CID) and name. Missing
+                            keys default to the arguments above. Events are tagged
+                            with the tenant CID in the "cid" key. Default: None.
     include_event_types:    List of event types to filter on. Defaults.
     exclude_event_types:    List of event types to exclude. Default: None.
+    include_event_patterns: List of glob patterns (or regular expressions prefixed
+                            with "re:") of event types to include. Default: None.
+    exclude_event_patterns: List of glob patterns (or regular expressions prefixed
+                            with "re:") of event types to exclude. Default: None.
+    include_event_fields:   List of dotted paths (e.g. event.Severity) of the event
+                            fields to keep. Other fields are dropped. Default: None.
+    exclude_event_fields:   List of dotted paths of the event fields to drop.
+                            Default: None.
     offset:                 The offset to start streaming from. Default: None.
     latest:                 Start stream at the latest event. Default: False.
     delay:                  Introduce a delay between each event. Default: float(0).
+                            Superseded by rate_limit, which it sets to 1/delay.
+    rate_limit:             Maximum number of events per second sent to the
+                            rulebook across all partitions. 0 disables. Default: 0
+    rate_limit_burst:       Number of events that may be sent at once before the
+                            rate limit applies. Default: rate_limit (minimum 1)
+    queue_high_water:       Stop reading from the stream while the rulebook queue
+                            holds at least this many events. 0 disables. Default: 0
+    queue_low_water:        Resume reading once the rulebook queue drains to this
+                            many events. Default: queue_high_water / 2
+    read_timeout:           Reconnect if no data is received for this many seconds.
+                            0 disables. Default: 300
+    max_reconnect_attempts: Stop after this many consecutive failed reconnection
+                            attempts. 0 retries forever. Default: 0
+    reconnect_max_backoff:  Maximum number of seconds to wait between reconnection
+                            attempts. Default: 60
+    connection_limit:       Maximum number of simultaneous stream connections. Must
+                            be at least the number of partitions of every tenant.
+                            0 disables. Default: 100
+    keepalive_timeout:      Seconds an idle connection is kept open for reuse. Default: 15
+    dns_cache_ttl:          Seconds resolved host names are cached. Default: 10
+    read_bufsize:           Size of the read buffer of each connection in bytes. The
+                            connection stops reading once twice this amount is
+                            buffered. Default: aiohttp default
+    use_aiodns:             Resolve host names with aiodns. Default: False
+    checkpoint_path:        Persist the last processed offset of each partition to
+                            this path and resume from it on startup. Default: None.
+    checkpoint_backend:     The checkpoint backend to use (file, sqlite).
+                            Default: file
+    checkpoint_flush_events:    Flush checkpoints after this many events. Default: 100
+    checkpoint_flush_interval:  Flush checkpoints after this many seconds. Default: 5
+    decode_thread_threshold:    Decode batches with at least this many events in a
+                                worker thread. 0 disables. Default: 0
+    metrics_port:           Serve Prometheus metrics over HTTP on this port.
+                            0 disables. Default: 0
+    metrics_host:           Address the metrics endpoint listens on.
+                            Default: 127.0.0.1
+    metrics_textfile:       Periodically write Prometheus metrics to this path, for
+                            the node exporter textfile collector. Default: None.
+    metrics_interval:       Seconds between writes of metrics_textfile. Default: 15
+    dedup_fields:           List of dotted paths into the event (e.g. event.DetectId)
+                            identifying duplicate events. Default: None (disabled).
+    dedup_window:           Seconds during which events with the same fields are
+                            considered duplicates. Default: 60
+    dedup_max_entries:      Maximum number of distinct events tracked. Default: 10000
+    dedup_mode:             How duplicates are handled (first, aggregate). "first"
+                            sends the first event and drops the duplicates.
+                            "aggregate" holds the first event for dedup_window
+                            seconds and sends it with the number of duplicates.
+                            Default: first
 
 
 Examples:
@@ -42,16 +104,100 @@ Examples:
         include_event_types:
           - "DetectionSummaryEvent"
 
+  # Stream every detection event except the noisiest ones
+  sources:
+    - crowdstrike.falcon.eventstream:
+        falcon_client_id: "{{ FALCON_CLIENT_ID }}"
+        falcon_client_secret: "{{ FALCON_CLIENT_SECRET }}"
+        include_event_patterns:
+          - "*Detection*"
+          - "re:^Incident.*Event$"
+        exclude_event_patterns:
+          - "*AuditEvent"
+
+  # Resume from the last processed offset after a restart
+  sources:
+    - crowdstrike.falcon.eventstream:
+        falcon_client_id: "{{ FALCON_CLIENT_ID }}"
+        falcon_client_secret: "{{ FALCON_CLIENT_SECRET }}"
+        checkpoint_path: "/var/lib/eda/falcon-checkpoints.json"
+
+  # Expose Prometheus metrics on http://127.0.0.1:9464/metrics
+  sources:
+    - crowdstrike.falcon.eventstream:
+        falcon_client_id: "{{ FALCON_CLIENT_ID }}"
+        falcon_client_secret: "{{ FALCON_CLIENT_SECRET }}"
+        metrics_port: 9464
+
+  # Send one event per detection every 5 minutes, with the number of duplicates
+  sources:
+    - crowdstrike.falcon.eventstream:
+        falcon_client_id: "{{ FALCON_CLIENT_ID }}"
+        falcon_client_secret: "{{ FALCON_CLIENT_SECRET }}"
+        dedup_fields:
+          - "metadata.eventType"
+          - "event.CompositeId"
+        dedup_window: 300
+        dedup_mode: "aggregate"
+
+  # Stream from several Flight Control child CIDs with the parent's credentials
+  sources:
+    - crowdstrike.falcon.eventstream:
+        falcon_client_id: "{{ FALCON_CLIENT_ID }}"
+        falcon_client_secret: "{{ FALCON_CLIENT_SECRET }}"
+        tenants:
+          - member_cid: "{{ CHILD_CID_1 }}"
+          - member_cid: "{{ CHILD_CID_2 }}"
+          - name: "other-parent"
+            falcon_client_id: "{{ OTHER_CLIENT_ID }}"
+            falcon_client_secret: "{{ OTHER_CLIENT_SECRET }}"
+            falcon_cloud: "eu-1"
+
+  # Only keep the fields used by the rulebook
+  sources:
+    - crowdstrike.falcon.eventstream:
+        falcon_client_id: "{{ FALCON_CLIENT_ID }}"
+        falcon_client_secret: "{{ FALCON_CLIENT_SECRET }}"
+        include_event_fields:
+          - "metadata"
+          - "event.Severity"
+          - "event.Hostname"
+          - "event.FalconHostLink"
+
 """
+# pylint: disable=too-many-lines
+import abc
 import asyncio
+import fnmatch
+import hashlib
 import json
 import logging
+import os
+import random
 import re
+import sqlite3
 import time
-from collections.abc import AsyncGenerator, Callable
-from typing import Any, Optional
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from typing import Any, ClassVar, Optional
 
 import aiohttp
+from aiohttp import web
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import aiodns  # noqa: F401 pylint: disable=unused-import
+
+    HAS_AIODNS = True
+except ImportError:
+    HAS_AIODNS = False
 
 logger = logging.getLogger()
 
@@ -82,13 +228,19 @@ class AIOFalconAPI:
         REFRESH_STREAM_URL (str): The endpoint for refreshing a stream.
         client_id (str): The client ID for authenticating to the Falcon API.
         client_secret (str): The client secret for authenticating to the Falcon API.
+        member_cid (str, optional): The Flight Control child CID to authenticate to.
         base_url (str, optional): The base URL for the Falcon API. Defaults to BASE_URL.
-        session (aiohttp.ClientSession): The aiohttp client session for making HTTP requests.
+        session (aiohttp.ClientSession): The aiohttp client session used for
+            authentication, listing and refresh requests.
+        stream_session (aiohttp.ClientSession): The aiohttp client session used for
+            the long-lived stream connections. Defaults to session.
 
     Methods
     -------
         close: Close the aiohttp client session.
         authenticate: Authenticate to the Falcon API and return the access token.
+        get_token: Return the cached access token, authenticating if it has expired.
+        invalidate_token: Discard the cached access token.
         list_available_streams: List available streams from the Falcon API.
         refresh_stream: Refresh a stream from the Falcon API.
 
@@ -98,12 +250,22 @@ class AIOFalconAPI:
     TOKEN_URL = "/oauth2/token"  # noqa: S105
     LIST_STREAMS_URL = "/sensors/entities/datafeed/v2"
     REFRESH_STREAM_URL = "/sensors/entities/datafeed-actions/v1/{partition}"
+    # Renew cached tokens this many seconds before they actually expire
+    TOKEN_EXPIRY_MARGIN = 60
+    # Size of the connection pool kept apart for auth, listing and refresh requests
+    API_CONNECTION_LIMIT = 10
 
     def __init__(
         self: "AIOFalconAPI",
         client_id: str,
         client_secret: str,
         base_url: Optional[str] = None,
+        connector: Optional[aiohttp.BaseConnector] = None,
+        read_bufsize: Optional[int] = None,
+        *,
+        member_cid: Optional[str] = None,
+        connector_owner: bool = True,
+        stream_connector: Optional[aiohttp.BaseConnector] = None,
     ) -> None:
         """Initialize a new AIOFalconAPI object.
 
@@ -115,17 +277,54 @@ class AIOFalconAPI:
             The client secret for authenticating to the Falcon API.
         base_url: str, optional
             The base URL for the Falcon API. Defaults to BASE_URL.
+        connector: aiohttp.BaseConnector, optional
+            The connector (connection pool) used by the session. Defaults to an
+            aiohttp connector with default settings.
+        read_bufsize: int, optional
+            The size of the read buffer of each response. Defaults to the aiohttp
+            default.
+        member_cid: str, optional
+            The Flight Control child CID to authenticate to.
+        connector_owner: bool
+            Close the connectors along with the sessions. Disable it when the
+            connectors are shared by several clients.
+        stream_connector: aiohttp.BaseConnector, optional
+            The connector used by the stream connections. Defaults to sharing the
+            session of the other requests.
 
         """
         self.client_id = client_id
         self.client_secret = client_secret
+        self.member_cid = member_cid
         self.base_url = base_url or self.BASE_URL
-        self.session = aiohttp.ClientSession(headers={
-            "User-Agent": f"crowdstrike-ansible/eda/{VERSION}",
-        })
+        self.access_token: Optional[str] = None
+        self.token_expires: float = 0
+        self.token_lock: asyncio.Lock = asyncio.Lock()
+        session_options: dict[str, Any] = {}
+        if read_bufsize:
+            session_options["read_bufsize"] = read_bufsize
+        headers = {"User-Agent": f"crowdstrike-ansible/eda/{VERSION}"}
+        self.session = aiohttp.ClientSession(
+            headers=headers,
+            connector=connector,
+            connector_owner=connector_owner,
+            **session_options,
+        )
+        # Streams hold their connection for as long as they run, so keep them in
+        # their own pool where they can't starve the token and refresh requests
+        self.stream_session = self.session
+        if stream_connector:
+            self.stream_session = aiohttp.ClientSession(
+                headers=headers,
+                connector=stream_connector,
+                connector_owner=connector_owner,
+                **session_options,
+            )
 
     async def close(self: "AIOFalconAPI") -> None:
-        """Close the aiohttp session."""
+        """Close the aiohttp sessions."""
+        if self.stream_session is not self.session:
+            await self.stream_session.close()
         await self.session.close()
 
     async def authenticate(self: "AIOFalconAPI") -> str:
@@ -133,7 +332,7 @@ class AIOFalconAPI:
 
         This method sends a POST request to the Falcon API's authentication endpoint,
         passing the client ID and secret in the request body. If authentication is
-        successful, it returns the access token provided by the API.
+        successful, it caches and returns the access token provided by the API.
 
         Returns
         -------
@@ -148,12 +347,41 @@ class AIOFalconAPI:
         """
         url = self.base_url + self.TOKEN_URL
         data = {"client_id": self.client_id, "client_secret": self.client_secret}
+        if self.member_cid:
+            data["member_cid"] = self.member_cid
         async with self.session.post(url, data=data) as resp:
             result = await resp.json()
             if not result.get("access_token"):
                 msg = "Failed to authenticate to CrowdStrike Falcon API. Check credentials/falcon_cloud and try again."
                 raise ValueError(msg)
-            return result["access_token"]
+            self.access_token = result["access_token"]
+            self.token_expires = (
+                time.monotonic()
+                + int(result.get("expires_in", 0))
+                - self.TOKEN_EXPIRY_MARGIN
+            )
+            return self.access_token
+
+    async def get_token(self: "AIOFalconAPI") -> str:
+        """Return the cached access token, authenticating again if it has expired.
+
+        Every stream partition shares the same token, so concurrent callers wait
+        for a single authentication request instead of each sending their own.
+
+        Returns
+        -------
+        str
+            A valid access token for the Falcon API.
+
+        """
+        async with self.token_lock:
+            if not self.access_token or time.monotonic() >= self.token_expires:
+                await self.authenticate()
+            return self.access_token
+
+    def invalidate_token(self: "AIOFalconAPI") -> None:
+        """Discard the cached access token so the next request authenticates again."""
+        self.access_token = None
 
     async def list_available_streams(
         self: "AIOFalconAPI",
@@ -226,262 +454,2198 @@ class AIOFalconAPI:
             return resp.status == ok_response
 
 
-class Stream:
-    """Stream class for the CrowdStrike Falcon Event Stream API."""
+def create_connector(
+    *,
+    limit: int = 100,
+    keepalive_timeout: float = 15,
+    dns_cache_ttl: int = 10,
+    use_aiodns: bool = False,
+) -> aiohttp.TCPConnector:
+    """Create the connection pool used for the Falcon API.
+
+    Parameters
+    ----------
+    limit: int
+        The maximum number of simultaneous connections.
+    keepalive_timeout: float
+        The number of seconds an idle connection is kept open for reuse.
+    dns_cache_ttl: int
+        The number of seconds resolved host names are cached.
+    use_aiodns: bool
+        Resolve host names asynchronously with aiodns instead of a thread pool.
+
+    Returns
+    -------
+    aiohttp.TCPConnector
+        The connection pool.
+
+    Raises
+    ------
+    ValueError
+        If use_aiodns is set but aiodns is not installed.
+
+    """
+    resolver: Optional[aiohttp.abc.AbstractResolver] = None
+    if use_aiodns:
+        if not HAS_AIODNS:
+            msg = "'use_aiodns' requires the aiodns library to be installed."
+            raise ValueError(msg)
+        resolver = aiohttp.AsyncResolver()
+
+    return aiohttp.TCPConnector(
+        limit=limit,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=dns_cache_ttl,
+        resolver=resolver,
+    )
+
+
+class EventProjection:
+    """Keep or drop fields of decoded events to reduce their size.
+
+    Fields are given as dotted paths into the raw event, such as
+    ``event.Severity``. Fields needed by the plugin itself (the event type,
+    offset, CID and creation time) are always kept.
+    """
+
+    REQUIRED_FIELDS = (
+        "metadata.eventType",
+        "metadata.offset",
+        "metadata.customerIDString",
+        "metadata.eventCreationTime",
+    )
 
     def __init__(
-        self: "Stream",
-        client: AIOFalconAPI,
-        stream_name: str,
-        offset: Optional[int],
-        latest: bool,
-        include_event_types: list[str],
-        stream: dict,
+        self: "EventProjection",
+        include_fields: list[str],
+        exclude_fields: list[str],
     ) -> None:
-        """Initialize a new Stream object.
+        """Initialize a new EventProjection object.
 
         Parameters
         ----------
-        client: AIOFalconAPI
-            An instance of the Falcon APIHarness client.
-        stream_name: str
-            A label identifying the connection.
-        offset: int
-            The offset to start streaming from.
-        latest: bool
-            Start stream at the latest event.
-        include_event_types: List[str]
-            A list of event types to filter on.
-        stream: dict
-            A dictionary containing the details of the stream.
+        include_fields: list[str]
+            The dotted paths of the fields to keep. Empty keeps every field.
+        exclude_fields: list[str]
+            The dotted paths of the fields to drop.
 
         """
-        logger.info("Initializing Stream: %s", stream_name)
-        self.client: AIOFalconAPI = client
-        self.session: aiohttp.ClientSession = client.session
-        self.stream_name: str = stream_name
-        self.data_feed: str = stream["dataFeedURL"]
-        self.token: str = stream["sessionToken"]["token"]
-        self.refresh_url: str = stream["refreshActiveSessionURL"]
-        self.partition: str = re.findall(r"v1/(\d+)", self.refresh_url)[0]
-        self.offset: int = offset if offset else 0
-        self.latest: bool = latest
-        self.include_event_types: list[str] = include_event_types
-        self.epoch: int = int(time.time())
-        self.refresh_interval: int = int(stream["refreshActiveSessionInterval"])
-        self.token_expired: Callable[[], bool] = lambda: (
-            (self.refresh_interval) - 60
-        ) + self.epoch < int(time.time())
-        self.spigot: Optional[aiohttp.ClientResponse] = None
-
-    async def refresh(self: "Stream") -> bool:
-        """Refresh the stream and client token.
+        self.include: Optional[dict] = (
+            self.compile([*include_fields, *self.REQUIRED_FIELDS]) if include_fields else None
+        )
+        self.exclude: Optional[dict] = self.compile(exclude_fields) if exclude_fields else None
+        # Never drop what the plugin relies on
+        if self.exclude:
+            for path in self.REQUIRED_FIELDS:
+                node = self.exclude
+                for key in path.split("."):
+                    if node.get(key, {}) is None:
+                        node[key] = {}
+                    node = node.get(key, {})
+
+    @staticmethod
+    def compile(paths: list[str]) -> dict:
+        """Build a tree of field names from dotted paths.
 
-        This method authenticates the client, and if authentication is successful,
-        it refreshes the active stream session.
+        Parameters
+        ----------
+        paths: list[str]
+            The dotted paths.
 
         Returns
         -------
-        bool
-            True if the refresh was successful (i.e., the server responded with a
-            status code of 200); False otherwise.
+        dict
+            Nested dicts of field names, where None marks a whole field.
 
         """
-        refreshed: bool = False
+        tree: dict = {}
+        for path in paths:
+            node = tree
+            *parents, leaf = path.split(".")
+            for key in parents:
+                child = node.setdefault(key, {})
+                if child is None:
+                    # A parent field is already kept or dropped whole
+                    break
+                node = child
+            else:
+                node[leaf] = None
+        return tree
+
+    @classmethod
+    def keep(cls: type["EventProjection"], value: dict, tree: dict) -> dict:
+        """Return a copy of a dict holding only the fields in a tree.
 
-        token = await self.client.authenticate()
-        refreshed_partition: bool = await self.client.refresh_stream(
-            token,
-            self.partition,
-            self.stream_name,
-        )
+        Parameters
+        ----------
+        value: dict
+            The dict to project.
+        tree: dict
+            The fields to keep.
 
-        if refreshed_partition:
-            self.epoch = int(time.time())
-            logger.info(
-                "Successfully refreshed stream %s:%s",
-                self.stream_name,
-                self.partition,
-            )
-            refreshed = True
+        Returns
+        -------
+        dict
+            The projected dict.
 
-        return refreshed
+        """
+        projected = {}
+        for key, subtree in tree.items():
+            if key not in value:
+                continue
+            field = value[key]
+            if subtree is None:
+                projected[key] = field
+            elif isinstance(field, dict):
+                projected[key] = cls.keep(field, subtree)
+        return projected
+
+    @classmethod
+    def drop(cls: type["EventProjection"], value: dict, tree: dict) -> None:
+        """Remove the fields in a tree from a dict, in place.
 
-    async def open_stream(self: "Stream") -> aiohttp.ClientResponse:
-        """Open a long-lived async HTTP connection to the CrowdStrike Falcon Event Stream.
+        Parameters
+        ----------
+        value: dict
+            The dict to trim.
+        tree: dict
+            The fields to remove.
 
-        Constructs the URL for the event stream using the data feed URL, offset, and
-        event type filter. This URL is used to send a GET request to the server. The
-        aiohttp.ClientSession is not managed within this function, so the caller must
-        ensure that the session is properly closed after usage.
+        """
+        for key, subtree in tree.items():
+            if subtree is None:
+                value.pop(key, None)
+            elif isinstance(value.get(key), dict):
+                cls.drop(value[key], subtree)
+
+    def apply(self: "EventProjection", event: dict[str, Any]) -> dict[str, Any]:
+        """Project a decoded event.
+
+        Parameters
+        ----------
+        event: dict[str, Any]
+            The decoded event.
 
         Returns
         -------
-        aiohttp.ClientResponse
-            The server's response to the GET request, which is an open streaming
-            connection.
+        dict[str, Any]
+            The event with only the selected fields.
 
         """
-        event_type_filter = (
-            ""
-            if not self.include_event_types
-            else f"&eventType={','.join(self.include_event_types)}"
-        )
-        offset_filter = "&whence=2" if self.latest else f"&offset={self.offset}"
+        if self.include is not None:
+            event = self.keep(event, self.include)
+        if self.exclude is not None:
+            self.drop(event, self.exclude)
+        return event
+
+
+class EventDecoder:
+    """Split a chunked NDJSON byte stream into lines and decode them in batches.
+
+    Chunks are read straight from the HTTP response and split on newlines using
+    zero-copy memoryview slices. When orjson is installed it is used to decode
+    each line, otherwise the standard library json module is used. Large batches
+    can optionally be decoded in a worker thread to keep the event loop free.
+    Events are projected as part of decoding, so unused fields are released
+    before they reach the queue.
+    """
 
-        kwargs = {
-            "url": f"{self.data_feed}{offset_filter}{event_type_filter}",
-            "headers": {
-                "Authorization": f"Token {self.token}",
-            },
-            "raise_for_status": True,
-            "timeout": aiohttp.ClientTimeout(total=None),
-        }
+    def __init__(
+        self: "EventDecoder",
+        thread_threshold: int = 0,
+        projection: Optional[EventProjection] = None,
+    ) -> None:
+        """Initialize a new EventDecoder object.
 
-        self.spigot: aiohttp.ClientResponse = await self.session.get(**kwargs)
-        logger.info(
-            "Successfully opened stream %s:%s",
-            self.stream_name,
-            self.partition,
-        )
-        logger.debug("Stream URL: %s", kwargs["url"])
-        return self.spigot
+        Parameters
+        ----------
+        thread_threshold: int
+            Decode batches with at least this many lines in a worker thread.
+            A value of 0 always decodes on the event loop.
+        projection: Optional[EventProjection]
+            The projection applied to each decoded event, if any.
 
-    async def stream_events(
-        self: "Stream",
-        exclude_event_types: list[str],
-    ) -> AsyncGenerator[dict[str, Any], None]:
-        """Asynchronously generate events from the CrowdStrike Falcon Event Stream API.
+        """
+        self.thread_threshold: int = thread_threshold
+        self.projection: Optional[EventProjection] = projection
+        self.remainder: bytes = b""
+
+    def reset(self: "EventDecoder") -> None:
+        """Discard any partial line left over from a previous connection."""
+        self.remainder = b""
 
-        This method opens a stream to the Falcon API, iterates over the lines in the
-        stream, and decodes and yields each event. It automatically refreshes the client
-        token and reopens the stream if the token has expired.
+    def split(self: "EventDecoder", chunk: bytes) -> list[memoryview]:
+        """Split a chunk into complete lines.
+
+        Any trailing partial line is kept and prepended to the next chunk. Blank
+        keep-alive lines are skipped.
 
         Parameters
         ----------
-        exclude_event_types: list[str]
-            A list of event types to be excluded from the stream.
+        chunk: bytes
+            The raw bytes read from the stream.
 
-        Yields
-        ------
-        dict[str, Any]
-            A dictionary containing the event data from the Falcon API and a
-            count of event types seen so far.
+        Returns
+        -------
+        list[memoryview]
+            The complete lines found in the chunk.
 
-        Raises
-        ------
-        ValueError
-            If client authentication fails during the token refresh process.
+        """
+        data = self.remainder + chunk if self.remainder else chunk
+        end = data.rfind(b"\n")
+        if end == -1:
+            self.remainder = data
+            return []
+        self.remainder = data[end + 1:]
+
+        view = memoryview(data)
+        lines = []
+        start = 0
+        while start < end:
+            newline = data.find(b"\n", start, end + 1)
+            # Only lines containing a JSON object are events
+            if data.find(b"{", start, newline) != -1:
+                lines.append(view[start:newline])
+            start = newline + 1
+        return lines
+
+    @staticmethod
+    def loads(line: memoryview) -> dict[str, Any]:
+        """Decode a single line into an event.
+
+        Parameters
+        ----------
+        line: memoryview
+            The raw bytes of a single event.
+
+        Returns
+        -------
+        dict[str, Any]
+            The decoded event.
 
         """
-        # Open the stream
-        await self.open_stream()
-        # Asynchronously iterate over the lines in the stream
-        async for line in self.spigot.content:
-            # Decode the line from bytes to a string and remove trailing whitespace
-            decoded_line = line.decode().rstrip()
-            if decoded_line:
-                # Load the event as a JSON object
-                json_event = json.loads(decoded_line)
-                event_type = json_event["metadata"]["eventType"]
-                self.offset = json_event["metadata"]["offset"]
-                # If the event is valid, yield it
-                if self.is_valid_event(event_type, exclude_event_types):
-                    yield {"falcon": json_event}
-            # If the token has expired, refresh it and reopen the stream
-            if self.token_expired():
-                refresh = await self.refresh()
-                if refresh:
-                    continue
-                msg = "Failed to refresh token."
-                raise ValueError(msg)
+        if HAS_ORJSON:
+            return orjson.loads(line)  # pylint: disable=no-member
+        return json.loads(bytes(line))
 
-    def is_valid_event(
-        self: "Stream",
-        event_type: str,
-        exclude_event_types: list[str],
-    ) -> bool:
-        """Check if a given event type is valid or not.
+    def decode_lines(self: "EventDecoder", lines: list[memoryview]) -> list[dict[str, Any]]:
+        """Decode a batch of lines into events.
 
         Parameters
         ----------
-        event_type: str
-            The type of the event to be checked.
-        exclude_event_types: list[str]
-            A list of event types to be excluded.
+        lines: list[memoryview]
+            The raw lines to decode.
 
         Returns
         -------
-        bool
-            Returns True if the event_type is not in the exclude_event_types list,
-            otherwise returns False.
+        list[dict[str, Any]]
+            The decoded events.
 
         """
-        return event_type not in exclude_event_types
+        if self.projection:
+            apply = self.projection.apply
+            return [apply(self.loads(line)) for line in lines]
+        return [self.loads(line) for line in lines]
 
+    async def decode(self: "EventDecoder", lines: list[memoryview]) -> list[dict[str, Any]]:
+        """Decode a batch of lines into events, in a worker thread if it is large.
 
-# pylint: disable=too-many-locals
-async def main(queue: asyncio.Queue, args: dict[str, Any]) -> None:
-    """Entrypoint for the eventstream event_source plugin.
+        Parameters
+        ----------
+        lines: list[memoryview]
+            The raw lines to decode.
 
-    Parameters
-    ----------
-    queue: asyncio.Queue
-        The queue to send events to
-    args: dict[str, Any]
-        The event_source arguments
+        Returns
+        -------
+        list[dict[str, Any]]
+            The decoded events.
 
-    Raises
-    ------
-    ValueError
-        If a argument is invalid
+        """
+        if self.thread_threshold and len(lines) >= self.thread_threshold:
+            return await asyncio.to_thread(self.decode_lines, lines)
+        return self.decode_lines(lines)
 
+
+class EventFilter:
+    """Decide which event types are forwarded to the rulebook.
+
+    Exact event types are kept in a frozenset and include/exclude patterns are
+    compiled once into a single regular expression each. Decisions are memoized
+    per event type, and ``prefilter`` applies them to the raw bytes of each line
+    so that excluded events are dropped before they are fully decoded.
     """
-    falcon_client_id: str = str(args.get("falcon_client_id"))
-    falcon_client_secret: str = str(args.get("falcon_client_secret"))
-    falcon_cloud: str = str(args.get("falcon_cloud", "us-1"))
-    stream_name: str = str(args.get("stream_name", "eda")).lower()
-    offset: Optional[int] = args.get("offset")
-    latest: bool = bool(args.get("latest", False))
-    delay: float = float(args.get("delay", 0))
-    include_event_types: list[str] = list(args.get("include_event_types", []))
-    exclude_event_types: list[str] = list(args.get("exclude_event_types", []))
 
-    if falcon_cloud not in REGIONS:
-        msg = f"Invalid falcon_cloud: {falcon_cloud}, must be one of {list(REGIONS.keys())}"
-        raise ValueError(msg)
+    # The data feed sends the metadata object first, and it only holds scalar
+    # fields, so its raw bytes stop at the first closing brace
+    METADATA_PATTERN = re.compile(rb'\{\s*"metadata"\s*:\s*\{')
+    OPEN_BRACE_PATTERN = re.compile(rb"\{")
+    CLOSE_BRACE_PATTERN = re.compile(rb"\}")
+    EVENT_TYPE_PATTERN = re.compile(rb'"eventType"\s*:\s*"([^"]+)"')
+    OFFSET_PATTERN = re.compile(rb'"offset"\s*:\s*(\d+)')
 
-    # Offset and latest are mutually exclusive
-    if offset and latest:
-        msg = "'offset' and 'latest' are mutually exclusive parameters."
-        raise ValueError(msg)
+    def __init__(
+        self: "EventFilter",
+        exclude_event_types: list[str],
+        include_event_patterns: list[str],
+        exclude_event_patterns: list[str],
+    ) -> None:
+        """Initialize a new EventFilter object.
 
-    falcon = AIOFalconAPI(
-        client_id=falcon_client_id,
-        client_secret=falcon_client_secret,
-        base_url=REGIONS[falcon_cloud],
-    )
+        Parameters
+        ----------
+        exclude_event_types: list[str]
+            A list of event types to be excluded.
+        include_event_patterns: list[str]
+            A list of glob patterns, or regular expressions prefixed with "re:",
+            matching the event types to include.
+        exclude_event_patterns: list[str]
+            A list of glob patterns, or regular expressions prefixed with "re:",
+            matching the event types to exclude.
 
-    token = await falcon.authenticate()
-    available_streams = await falcon.list_available_streams(token, stream_name)
+        """
+        self.exclude_event_types: frozenset[str] = frozenset(exclude_event_types)
+        self.include_pattern: Optional[re.Pattern] = self.compile(include_event_patterns)
+        self.exclude_pattern: Optional[re.Pattern] = self.compile(exclude_event_patterns)
+        self.active: bool = bool(
+            self.exclude_event_types or self.include_pattern or self.exclude_pattern,
+        )
+        self.decisions: dict[str, bool] = {}
 
-    if not available_streams["resources"]:
+    @staticmethod
+    def compile(patterns: list[str]) -> Optional[re.Pattern]:
+        """Compile a list of glob or "re:" prefixed patterns into one expression.
+
+        Parameters
+        ----------
+        patterns: list[str]
+            The patterns to compile.
+
+        Returns
+        -------
+        Optional[re.Pattern]
+            The compiled expression, or None if no patterns were given.
+
+        """
+        if not patterns:
+            return None
+        expressions = [
+            pattern[3:] if pattern.startswith("re:") else fnmatch.translate(pattern)
+            for pattern in patterns
+        ]
+        return re.compile("|".join(f"(?:{expression})" for expression in expressions))
+
+    def allows(self: "EventFilter", event_type: str) -> bool:
+        """Check if an event type should be forwarded.
+
+        Parameters
+        ----------
+        event_type: str
+            The type of the event to be checked.
+
+        Returns
+        -------
+        bool
+            True if the event type is not excluded and matches the include
+            patterns (if any), otherwise False.
+
+        """
+        allowed = self.decisions.get(event_type)
+        if allowed is None:
+            allowed = (
+                event_type not in self.exclude_event_types
+                and (not self.include_pattern or bool(self.include_pattern.fullmatch(event_type)))
+                and not (self.exclude_pattern and self.exclude_pattern.fullmatch(event_type))
+            )
+            self.decisions[event_type] = allowed
+        return allowed
+
+    def prefilter(
+        self: "EventFilter",
+        lines: list[memoryview],
+        skipped: Optional[Counter] = None,
+    ) -> tuple[list[memoryview], int]:
+        """Drop lines whose event type is filtered out before they are decoded.
+
+        The event type and offset are read from the raw bytes of the metadata
+        object that starts each line, so that keys of the event payload are never
+        mistaken for them. Lines that do not start with a flat metadata object, or
+        where the event type cannot be found, are kept so they are checked again
+        once decoded.
+
+        Parameters
+        ----------
+        lines: list[memoryview]
+            The raw lines read from the stream.
+        skipped: Optional[Counter]
+            If given, the number of dropped lines is counted in it per event type.
+
+        Returns
+        -------
+        tuple[list[memoryview], int]
+            The lines to decode, and the highest offset among the dropped lines
+            (-1 if no line was dropped).
+
+        """
+        if not self.active:
+            return lines, -1
+
+        kept = []
+        skipped_offset = -1
+        for line in lines:
+            metadata = self.METADATA_PATTERN.match(line)
+            end = self.CLOSE_BRACE_PATTERN.search(line, metadata.end()) if metadata else None
+            # Only trust a flat metadata object, a nested one could hold other keys
+            if not end or self.OPEN_BRACE_PATTERN.search(line, metadata.end(), end.start()):
+                kept.append(line)
+                continue
+            event_type = self.EVENT_TYPE_PATTERN.search(line, metadata.end(), end.start())
+            if event_type and not self.allows(event_type.group(1).decode()):
+                if skipped is not None:
+                    skipped[event_type.group(1).decode()] += 1
+                offset = self.OFFSET_PATTERN.search(line, metadata.end(), end.start())
+                if offset:
+                    skipped_offset = max(skipped_offset, int(offset.group(1)))
+                continue
+            kept.append(line)
+        return kept, skipped_offset
+
+
+class FlowControl:
+    """Rate limit and apply backpressure to the events sent to the rulebook queue.
+
+    A token bucket shared by every partition caps the number of events per second
+    while allowing short bursts. When the queue grows past the high-water mark,
+    ``put`` waits until it drains to the low-water mark. Because partitions stop
+    pulling events while waiting, reading from the HTTP stream pauses too and
+    aiohttp stops buffering data the rulebook cannot keep up with.
+    """
+
+    DRAIN_POLL_INTERVAL = 0.05
+
+    def __init__(
+        self: "FlowControl",
+        queue: asyncio.Queue,
+        rate: float = 0,
+        burst: int = 1,
+        high_water: int = 0,
+        low_water: int = 0,
+    ) -> None:
+        """Initialize a new FlowControl object.
+
+        Parameters
+        ----------
+        queue: asyncio.Queue
+            The queue to send events to.
+        rate: float
+            The maximum number of events per second. 0 disables rate limiting.
+        burst: int
+            The number of events that may be sent at once.
+        high_water: int
+            The queue size at which reading pauses. 0 disables backpressure.
+        low_water: int
+            The queue size at which reading resumes.
+
+        """
+        self.queue: asyncio.Queue = queue
+        self.rate: float = rate
+        self.capacity: float = float(max(burst, 1))
+        self.tokens: float = self.capacity
+        self.updated: float = time.monotonic()
+        self.high_water: int = high_water
+        self.low_water: int = min(low_water, high_water)
+
+    async def acquire(self: "FlowControl") -> None:
+        """Take a token from the bucket, waiting until one is available."""
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Reserve the token up front so concurrent partitions queue up fairly
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    async def drain(self: "FlowControl") -> None:
+        """Wait for the queue to drain below the low-water mark if it is too full."""
+        if not self.high_water or self.queue.qsize() < self.high_water:
+            return
+        logger.debug("Queue reached %d events, pausing stream reads", self.queue.qsize())
+        # The rulebook consumes the queue without signalling us, so poll its size
+        while self.queue.qsize() > self.low_water:  # noqa: ASYNC110
+            await asyncio.sleep(self.DRAIN_POLL_INTERVAL)
+        logger.debug("Queue drained to %d events, resuming stream reads", self.queue.qsize())
+
+    async def put(self: "FlowControl", event: dict[str, Any]) -> None:
+        """Send an event to the queue, honoring the rate limit and backpressure.
+
+        Parameters
+        ----------
+        event: dict[str, Any]
+            The event to send.
+
+        """
+        await self.acquire()
+        await self.queue.put(event)
+        await self.drain()
+
+
+class Deduplicator:
+    """Drop or coalesce duplicate events within a time window.
+
+    Events are identified by a compact fingerprint of the configured fields. The
+    fingerprints seen in the last ``window`` seconds are kept in insertion order,
+    so expired entries are always at the front and the oldest entries are evicted
+    first once ``max_entries`` is reached.
+
+    In ``first`` mode the first event of each fingerprint is sent right away and
+    its duplicates are dropped. In ``aggregate`` mode the first event is held
+    until its window ends (or it is evicted) and then sent once with the number
+    of duplicates. Held events are lost if the plugin stops before they are sent,
+    even though their offsets may already be checkpointed.
+    """
+
+    MODES = ("first", "aggregate")
+    # What admit decides for an event
+    SEND = "send"
+    HOLD = "hold"
+    DROP = "drop"
+
+    def __init__(
+        self: "Deduplicator",
+        fields: list[str],
+        window: float = 60,
+        max_entries: int = 10000,
+        mode: str = "first",
+    ) -> None:
+        """Initialize a new Deduplicator object.
+
+        Parameters
+        ----------
+        fields: list[str]
+            The dotted paths of the event fields identifying duplicates.
+        window: float
+            The number of seconds during which events are considered duplicates.
+        max_entries: int
+            The maximum number of fingerprints kept.
+        mode: str
+            How duplicates are handled, one of MODES.
+
+        """
+        self.fields: list[list[str]] = [field.split(".") for field in fields]
+        self.window: float = window
+        self.max_entries: int = max(max_entries, 1)
+        self.aggregate: bool = mode == "aggregate"
+        # Fingerprint: [first seen, duplicate count, held event, last seen, held event stream]
+        self.entries: OrderedDict[bytes, list[Any]] = OrderedDict()
+        self.ready: list[tuple[dict[str, Any], Optional[Stream]]] = []
+
+    def fingerprint(self: "Deduplicator", event: dict[str, Any]) -> Optional[bytes]:
+        """Return the fingerprint of an event.
+
+        Parameters
+        ----------
+        event: dict[str, Any]
+            The raw event from the API.
+
+        Returns
+        -------
+        Optional[bytes]
+            A 16 byte digest of the configured fields, or None if the event has
+            none of them.
+
+        """
+        values = []
+        for path in self.fields:
+            value: Any = event
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value)
+        if all(value is None for value in values):
+            return None
+        encoded = json.dumps(values, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(encoded, digest_size=16).digest()
+
+    def admit(self: "Deduplicator", event: dict[str, Any], stream: Optional["Stream"] = None) -> str:
+        """Record an event and decide whether it should be sent right away.
+
+        Parameters
+        ----------
+        event: dict[str, Any]
+            The event to record, as sent to the queue.
+        stream: Optional[Stream]
+            The stream partition the event was read from, returned with the
+            event once released.
+
+        Returns
+        -------
+        str
+            SEND if the event should be sent now, HOLD if it is held to be
+            aggregated, or DROP if it is a duplicate.
+
+        """
+        key = self.fingerprint(event["falcon"])
+        if key is None:
+            return self.SEND
+        now = time.monotonic()
+        self.expire(now)
+
+        entry = self.entries.get(key)
+        if entry:
+            entry[1] += 1
+            entry[3] = time.time()
+            return self.DROP
+
+        if len(self.entries) >= self.max_entries:
+            self.release(self.entries.popitem(last=False)[1])
+        if not self.aggregate:
+            self.entries[key] = [now, 0, None, time.time(), None]
+            return self.SEND
+        self.entries[key] = [now, 0, event, time.time(), stream]
+        return self.HOLD
+
+    def expire(self: "Deduplicator", now: float) -> None:
+        """Forget the fingerprints whose window has ended.
+
+        Parameters
+        ----------
+        now: float
+            The current monotonic time.
+
+        """
+        while self.entries:
+            first_seen = next(iter(self.entries.values()))[0]
+            if now - first_seen < self.window:
+                break
+            self.release(self.entries.popitem(last=False)[1])
+
+    def release(self: "Deduplicator", entry: list[Any]) -> None:
+        """Queue the held event of a forgotten fingerprint for sending.
+
+        Parameters
+        ----------
+        entry: list[Any]
+            The forgotten entry.
+
+        """
+        if not self.aggregate:
+            return
+        _, duplicates, event, last_seen, stream = entry
+        event["dedup"] = {"count": duplicates + 1, "last_seen": last_seen}
+        self.ready.append((event, stream))
+
+    def next_expiry(self: "Deduplicator") -> float:
+        """Return the number of seconds until the oldest fingerprint expires.
+
+        Returns
+        -------
+        float
+            The number of seconds, or the window if no fingerprint is kept.
+
+        """
+        if not self.entries:
+            return self.window
+        first_seen = next(iter(self.entries.values()))[0]
+        return max(first_seen + self.window - time.monotonic(), 0)
+
+    def pop_ready(self: "Deduplicator", *, flush: bool = False) -> list[tuple[dict[str, Any], Optional["Stream"]]]:
+        """Return the aggregated events that are ready to be sent.
+
+        Parameters
+        ----------
+        flush: bool
+            Release every held event, regardless of its window.
+
+        Returns
+        -------
+        list[tuple[dict[str, Any], Optional[Stream]]]
+            The aggregated events, with the stream partition they were read from.
+
+        """
+        self.expire(float("inf") if flush else time.monotonic())
+        ready, self.ready = self.ready, []
+        return ready
+
+
+async def send_released(dedup: Deduplicator, flow: FlowControl, *, flush: bool = False) -> None:
+    """Send the aggregated events that are ready to the queue.
+
+    Parameters
+    ----------
+    dedup: Deduplicator
+        The deduplicator holding the events.
+    flow: FlowControl
+        The rate limited queue to send events to.
+    flush: bool
+        Send every held event, regardless of its window.
+
+    """
+    for event, stream in dedup.pop_ready(flush=flush):
+        await flow.put(event)
+        # Held events are only counted as emitted once they are sent
+        if stream and stream.metrics:
+            event_type = event["falcon"]["metadata"]["eventType"]
+            stream.metrics.inc("events_emitted_total", event_type=event_type, **stream.labels)
+
+
+async def send_aggregated(dedup: Deduplicator, flow: FlowControl) -> None:
+    """Send aggregated events to the queue as their window ends.
+
+    Parameters
+    ----------
+    dedup: Deduplicator
+        The deduplicator holding the events.
+    flow: FlowControl
+        The rate limited queue to send events to.
+
+    """
+    while True:
+        await asyncio.sleep(dedup.next_expiry())
+        await send_released(dedup, flow)
+
+
+class CheckpointStore(abc.ABC):
+    """Base class for persisting the last processed offset of each partition.
+
+    Offsets are buffered in memory and written to the backend in batches, either
+    once ``flush_events`` offsets have been committed or once ``flush_interval``
+    seconds have passed since the last write. Writes run in a worker thread so
+    they never block the event loop. Subclasses only need to implement ``_read``
+    and ``_write``.
+    """
+
+    def __init__(
+        self: "CheckpointStore",
+        path: str,
+        flush_events: int = 100,
+        flush_interval: float = 5.0,
+    ) -> None:
+        """Initialize a new CheckpointStore object.
+
+        Parameters
+        ----------
+        path: str
+            The location of the checkpoint backend.
+        flush_events: int
+            The number of committed offsets after which pending offsets are flushed.
+        flush_interval: float
+            The number of seconds after which pending offsets are flushed.
+
+        """
+        self.path: str = path
+        self.flush_events: int = flush_events
+        self.flush_interval: float = flush_interval
+        self.pending: dict[tuple[str, str], int] = {}
+        self.commits: int = 0
+        self.last_flush: float = time.monotonic()
+        # Partitions flushing at the same time write one after the other
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    def load(self: "CheckpointStore", stream_name: str, partition: str) -> Optional[int]:
+        """Return the last stored offset for a partition.
+
+        Parameters
+        ----------
+        stream_name: str
+            A label identifying the connection.
+        partition: str
+            The partition ID of the stream.
+
+        Returns
+        -------
+        Optional[int]
+            The last processed offset, or None if no checkpoint exists.
+
+        """
+        return self._read().get((stream_name, partition))
+
+    async def commit(
+        self: "CheckpointStore",
+        stream_name: str,
+        partition: str,
+        offset: int,
+    ) -> None:
+        """Record the last processed offset for a partition.
+
+        Parameters
+        ----------
+        stream_name: str
+            A label identifying the connection.
+        partition: str
+            The partition ID of the stream.
+        offset: int
+            The offset of the last processed event.
+
+        """
+        self.pending[(stream_name, partition)] = offset
+        self.commits += 1
+        if (
+            self.commits >= self.flush_events
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            await self.flush()
+
+    async def flush(self: "CheckpointStore") -> None:
+        """Write any pending offsets to the backend."""
+        async with self.lock:
+            # Offsets committed during the write are kept for the next flush
+            pending, self.pending = self.pending, {}
+            self.commits = 0
+            self.last_flush = time.monotonic()
+            if not pending:
+                return
+            write = asyncio.ensure_future(asyncio.to_thread(self._write, pending))
+            try:
+                await asyncio.shield(write)
+            finally:
+                # A cancelled partition still lets the write finish before the next one starts
+                if not write.done():
+                    await asyncio.wait([write])
+                if write.cancelled() or write.exception():
+                    # Retry on the next flush, unless newer offsets were committed since
+                    self.pending = {**pending, **self.pending}
+            logger.debug("Flushed %d checkpoint(s) to %s", len(pending), self.path)
+
+    async def close(self: "CheckpointStore") -> None:
+        """Flush pending offsets and release the backend."""
+        await self.flush()
+
+    @abc.abstractmethod
+    def _read(self: "CheckpointStore") -> dict[tuple[str, str], int]:
+        """Read every stored offset from the backend, keyed by (stream_name, partition)."""
+
+    @abc.abstractmethod
+    def _write(self: "CheckpointStore", offsets: dict[tuple[str, str], int]) -> None:
+        """Persist offsets to the backend.
+
+        Called from a worker thread, never for two flushes at once.
+
+        Parameters
+        ----------
+        offsets: dict[tuple[str, str], int]
+            The offsets to persist, keyed by (stream_name, partition).
+
+        """
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Checkpoint store backed by a local JSON file.
+
+    The file is rewritten atomically on every flush so that a crash never leaves
+    a partially written checkpoint behind.
+    """
+
+    def _read(self: "FileCheckpointStore") -> dict[tuple[str, str], int]:
+        """Read every stored offset from the JSON file.
+
+        Returns
+        -------
+        dict[tuple[str, str], int]
+            The stored offsets, keyed by (stream_name, partition).
+
+        """
+        try:
+            data = json.loads(Path(self.path).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        return {
+            tuple(key.rsplit(":", 1)): int(offset) for key, offset in data.items()
+        }
+
+    def _write(self: "FileCheckpointStore", offsets: dict[tuple[str, str], int]) -> None:
+        """Merge offsets into the JSON file.
+
+        Parameters
+        ----------
+        offsets: dict[tuple[str, str], int]
+            The offsets to persist, keyed by (stream_name, partition).
+
+        """
+        stored = self._read()
+        stored.update(offsets)
+        data = {f"{name}:{partition}": offset for (name, partition), offset in stored.items()}
+        path = Path(self.path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.write(json.dumps(data))
+            # Make sure the data is on disk before it replaces the previous checkpoint
+            handle.flush()
+            os.fsync(handle.fileno())
+        tmp_path.replace(path)
+        # Persist the rename itself
+        directory = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Checkpoint store backed by a local SQLite database."""
+
+    def __init__(
+        self: "SQLiteCheckpointStore",
+        path: str,
+        flush_events: int = 100,
+        flush_interval: float = 5.0,
+    ) -> None:
+        """Initialize a new SQLiteCheckpointStore object.
+
+        Parameters
+        ----------
+        path: str
+            The path to the SQLite database.
+        flush_events: int
+            The number of committed offsets after which pending offsets are flushed.
+        flush_interval: float
+            The number of seconds after which pending offsets are flushed.
+
+        """
+        super().__init__(path, flush_events, flush_interval)
+        # Offsets are written from worker threads, one flush at a time
+        self.connection: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "stream_name TEXT NOT NULL, "
+                "partition TEXT NOT NULL, "
+                "offset INTEGER NOT NULL, "
+                "PRIMARY KEY (stream_name, partition))",
+            )
+
+    async def close(self: "SQLiteCheckpointStore") -> None:
+        """Flush pending offsets and close the database connection."""
+        await super().close()
+        self.connection.close()
+
+    def _read(self: "SQLiteCheckpointStore") -> dict[tuple[str, str], int]:
+        """Read every stored offset from the database.
+
+        Returns
+        -------
+        dict[tuple[str, str], int]
+            The stored offsets, keyed by (stream_name, partition).
+
+        """
+        rows = self.connection.execute(
+            "SELECT stream_name, partition, offset FROM checkpoints",
+        )
+        return {(name, partition): offset for name, partition, offset in rows}
+
+    def _write(self: "SQLiteCheckpointStore", offsets: dict[tuple[str, str], int]) -> None:
+        """Upsert offsets into the database.
+
+        Parameters
+        ----------
+        offsets: dict[tuple[str, str], int]
+            The offsets to persist, keyed by (stream_name, partition).
+
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO checkpoints (stream_name, partition, offset) "
+                "VALUES (?, ?, ?)",
+                [(name, partition, offset) for (name, partition), offset in offsets.items()],
+            )
+
+
+# Checkpoint backends selectable with the checkpoint_backend argument
+CHECKPOINT_BACKENDS: dict[str, type[CheckpointStore]] = {
+    "file": FileCheckpointStore,
+    "sqlite": SQLiteCheckpointStore,
+}
+
+
+class Backoff:
+    """Capped exponential backoff with jitter between retries."""
+
+    def __init__(self: "Backoff", max_attempts: int = 0, max_delay: float = 60) -> None:
+        """Initialize a new Backoff object.
+
+        Parameters
+        ----------
+        max_attempts: int
+            The number of consecutive retries allowed. 0 allows unlimited retries.
+        max_delay: float
+            The maximum number of seconds to wait between retries.
+
+        """
+        self.max_attempts: int = max_attempts
+        self.max_delay: float = max_delay
+        self.attempts: int = 0
+
+    @property
+    def exhausted(self: "Backoff") -> bool:
+        """Whether every allowed retry has been used.
+
+        Returns
+        -------
+        bool
+            True if no retries are left, otherwise False.
+
+        """
+        return bool(self.max_attempts) and self.attempts >= self.max_attempts
+
+    def reset(self: "Backoff") -> None:
+        """Start counting retries from zero again."""
+        self.attempts = 0
+
+    def next_delay(self: "Backoff") -> float:
+        """Count a retry and return how long to wait before it.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait.
+
+        """
+        delay = min(2**self.attempts, self.max_delay) + random.uniform(0, 1)  # noqa: S311
+        self.attempts += 1
+        return delay
+
+
+class Metrics:
+    """Collect plugin metrics and render them in the Prometheus text format.
+
+    Each sample is identified by the metric name and its labels. Histograms keep
+    a cumulative count per bucket upper bound, along with the sum and count of
+    every observation.
+    """
+
+    BUCKETS: ClassVar[tuple[float, ...]] = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+    # Metric name: (type, help)
+    METRICS: ClassVar[dict[str, tuple[str, str]]] = {
+        "events_received_total": ("counter", "Events read from the stream."),
+        "events_filtered_total": ("counter", "Events dropped by the event type filters."),
+        "events_emitted_total": ("counter", "Events sent to the rulebook queue."),
+        "decode_seconds": ("histogram", "Time spent decoding a batch of events."),
+        "queue_put_seconds": ("histogram", "Time spent waiting to send an event to the queue."),
+        "offset": ("gauge", "Offset of the last processed event."),
+        "lag_seconds": ("gauge", "Age of the last processed event when it was read."),
+        "refreshes_total": ("counter", "Stream session refresh attempts."),
+        "refresh_seconds": ("histogram", "Time spent refreshing the stream session."),
+        "reconnects_total": ("counter", "Reconnections to the stream."),
+        "events_deduplicated_total": ("counter", "Duplicate events dropped or counted in an aggregated event."),
+    }
+
+    PREFIX = "falcon_eventstream_"
+
+    def __init__(self: "Metrics") -> None:
+        """Initialize a new Metrics object."""
+        self.samples: dict[str, dict[tuple, float]] = defaultdict(dict)
+        self.histograms: dict[str, dict[tuple, list[float]]] = defaultdict(dict)
+
+    def inc(self: "Metrics", name: str, value: float = 1, **labels: str) -> None:
+        """Increase a counter.
+
+        Parameters
+        ----------
+        name: str
+            The name of the counter.
+        value: float
+            The amount to increase the counter by.
+        **labels: str
+            The labels of the sample.
+
+        """
+        key = tuple(sorted(labels.items()))
+        samples = self.samples[name]
+        samples[key] = samples.get(key, 0) + value
+
+    def set(self: "Metrics", name: str, value: float, **labels: str) -> None:
+        """Set the value of a gauge.
+
+        Parameters
+        ----------
+        name: str
+            The name of the gauge.
+        value: float
+            The new value of the gauge.
+        **labels: str
+            The labels of the sample.
+
+        """
+        self.samples[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self: "Metrics", name: str, value: float, **labels: str) -> None:
+        """Record an observation in a histogram.
+
+        Parameters
+        ----------
+        name: str
+            The name of the histogram.
+        value: float
+            The observed value.
+        **labels: str
+            The labels of the sample.
+
+        """
+        key = tuple(sorted(labels.items()))
+        # One count per bucket, followed by the sum and count of observations
+        buckets = self.histograms[name].setdefault(key, [0.0] * (len(self.BUCKETS) + 2))
+        for i, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        buckets[-2] += value
+        buckets[-1] += 1
+
+    @staticmethod
+    def format_labels(labels: tuple) -> str:
+        """Format the labels of a sample.
+
+        Parameters
+        ----------
+        labels: tuple
+            The (name, value) pairs of the labels.
+
+        Returns
+        -------
+        str
+            The labels enclosed in braces, or an empty string if there are none.
+
+        """
+        if not labels:
+            return ""
+        pairs = ",".join(
+            '{}="{}"'.format(
+                name,
+                str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+            )
+            for name, value in labels
+        )
+        return f"{{{pairs}}}"
+
+    def render(self: "Metrics") -> str:
+        """Render every metric in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            The metrics.
+
+        """
+        lines = []
+        for name, (kind, description) in self.METRICS.items():
+            full_name = f"{self.PREFIX}{name}"
+            lines.append(f"# HELP {full_name} {description}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in self.samples.get(name, {}).items():
+                lines.append(f"{full_name}{self.format_labels(labels)} {value}")
+            for labels, buckets in self.histograms.get(name, {}).items():
+                for bound, count in zip(self.BUCKETS, buckets, strict=False):
+                    bucket_labels = self.format_labels((*labels, ("le", str(bound))))
+                    lines.append(f"{full_name}_bucket{bucket_labels} {count}")
+                bucket_labels = self.format_labels((*labels, ("le", "+Inf")))
+                lines.append(f"{full_name}_bucket{bucket_labels} {buckets[-1]}")
+                lines.append(f"{full_name}_sum{self.format_labels(labels)} {buckets[-2]}")
+                lines.append(f"{full_name}_count{self.format_labels(labels)} {buckets[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+class Stream:
+    """Stream class for the CrowdStrike Falcon Event Stream API."""
+
+    # Refresh the session this many seconds before refreshActiveSessionInterval
+    REFRESH_MARGIN = 60
+    REFRESH_ATTEMPTS = 5
+
+    def __init__(
+        self: "Stream",
+        client: AIOFalconAPI,
+        stream_name: str,
+        offset: Optional[int],
+        latest: bool,
+        include_event_types: list[str],
+        stream: dict,
+        decode_thread_threshold: int = 0,
+        read_timeout: float = 0,
+        metrics: Optional[Metrics] = None,
+        projection: Optional[EventProjection] = None,
+        *,
+        tenant: Optional[str] = None,
+        cid: Optional[str] = None,
+    ) -> None:
+        """Initialize a new Stream object.
+
+        Parameters
+        ----------
+        client: AIOFalconAPI
+            An instance of the Falcon APIHarness client.
+        stream_name: str
+            A label identifying the connection.
+        offset: int
+            The offset to start streaming from.
+        latest: bool
+            Start stream at the latest event.
+        include_event_types: List[str]
+            A list of event types to filter on.
+        stream: dict
+            A dictionary containing the details of the stream.
+        decode_thread_threshold: int
+            Decode batches with at least this many events in a worker thread.
+        read_timeout: float
+            The number of seconds without data after which the connection is
+            considered dead. 0 disables the timeout.
+        metrics: Optional[Metrics]
+            The metrics to record the stream activity in, if any.
+        projection: Optional[EventProjection]
+            The projection applied to each event, if any.
+        tenant: Optional[str]
+            The name of the tenant the stream belongs to, when streaming from
+            several tenants.
+        cid: Optional[str]
+            The CID events are tagged with. Defaults to the customerIDString of
+            each event when a tenant is set.
+
+        """
+        # Tenants share stream names, so prefix them wherever streams are told apart
+        self.name: str = f"{tenant}/{stream_name}" if tenant else stream_name
+        logger.info("Initializing Stream: %s", self.name)
+        self.client: AIOFalconAPI = client
+        self.session: aiohttp.ClientSession = client.stream_session
+        self.stream_name: str = stream_name
+        self.update_session(stream)
+        self.partition: str = self.partition_of(stream)
+        self.offset: int = offset if offset else 0
+        self.latest: bool = latest
+        self.include_event_types: list[str] = include_event_types
+        self.read_timeout: float = read_timeout
+        self.resume: bool = False
+        self.opened_at: float = 0
+        self.spigot: Optional[aiohttp.ClientResponse] = None
+        self.decoder: EventDecoder = EventDecoder(decode_thread_threshold, projection)
+        self.metrics: Optional[Metrics] = metrics
+        # Events of the current batch sent to the queue per event type, counted by send_event
+        self.emitted: Counter = Counter()
+        self.tenant: Optional[str] = tenant
+        self.cid: Optional[str] = cid
+        self.labels: dict[str, str] = {"stream": stream_name, "partition": self.partition}
+        if tenant:
+            self.labels["tenant"] = tenant
+
+    @staticmethod
+    def partition_of(stream: dict) -> str:
+        """Return the partition ID of a stream resource.
+
+        Parameters
+        ----------
+        stream: dict
+            A dictionary containing the details of the stream.
+
+        Returns
+        -------
+        str
+            The partition ID of the stream.
+
+        """
+        return re.findall(r"v1/(\d+)", stream["refreshActiveSessionURL"])[0]
+
+    def update_session(self: "Stream", stream: dict) -> None:
+        """Use the data feed and session details of a stream resource.
+
+        Parameters
+        ----------
+        stream: dict
+            A dictionary containing the details of the stream.
+
+        """
+        self.data_feed: str = stream["dataFeedURL"]
+        self.token: str = stream["sessionToken"]["token"]
+        self.refresh_url: str = stream["refreshActiveSessionURL"]
+        self.refresh_interval: int = int(stream["refreshActiveSessionInterval"])
+        self.epoch: int = int(time.time())
+
+    async def rediscover(self: "Stream") -> None:
+        """Look up a fresh data feed URL and session token for this partition.
+
+        Raises
+        ------
+        ValueError
+            If the partition is no longer listed by the Event Stream API.
+
+        """
+        token = await self.client.get_token()
+        available_streams = await self.client.list_available_streams(token, self.stream_name)
+        for stream in available_streams.get("resources") or []:
+            if self.partition_of(stream) == self.partition:
+                self.update_session(stream)
+                logger.info(
+                    "Rediscovered data feed for stream %s:%s",
+                    self.name,
+                    self.partition,
+                )
+                return
+        msg = f"Stream partition {self.partition} is no longer available."
+        raise ValueError(msg)
+
+    async def refresh(self: "Stream") -> bool:
+        """Refresh the stream and client token.
+
+        This method fetches the shared client token, and if it is valid, it refreshes
+        the active stream session.
+
+        Returns
+        -------
+        bool
+            True if the refresh was successful (i.e., the server responded with a
+            status code of 200); False otherwise.
+
+        """
+        refreshed: bool = False
+
+        started = time.monotonic()
+        token = await self.client.get_token()
+        refreshed_partition: bool = await self.client.refresh_stream(
+            token,
+            self.partition,
+            self.stream_name,
+        )
+        if self.metrics:
+            self.metrics.observe("refresh_seconds", time.monotonic() - started, **self.labels)
+            result = "success" if refreshed_partition else "failure"
+            self.metrics.inc("refreshes_total", result=result, **self.labels)
+
+        if refreshed_partition:
+            self.epoch = int(time.time())
+            logger.info(
+                "Successfully refreshed stream %s:%s",
+                self.name,
+                self.partition,
+            )
+            refreshed = True
+        else:
+            # The cached token may have been revoked, authenticate again next time
+            self.client.invalidate_token()
+
+        return refreshed
+
+    async def keep_alive(self: "Stream") -> None:
+        """Refresh the stream session in the background before it expires.
+
+        The session is refreshed REFRESH_MARGIN seconds before the end of the
+        refreshActiveSessionInterval advertised by the API, independently of
+        whether any event has been received. Failed refreshes are retried with
+        jittered exponential backoff.
+
+        Raises
+        ------
+        ValueError
+            If the stream could not be refreshed after REFRESH_ATTEMPTS attempts.
+
+        """
+        while True:
+            expires_in = self.refresh_interval - (int(time.time()) - self.epoch)
+            await asyncio.sleep(max(expires_in - self.REFRESH_MARGIN, 0))
+
+            backoff = Backoff(self.REFRESH_ATTEMPTS)
+            while True:
+                try:
+                    if await self.refresh():
+                        break
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    logger.warning(
+                        "Error refreshing stream %s:%s",
+                        self.name,
+                        self.partition,
+                        exc_info=True,
+                    )
+                if backoff.exhausted:
+                    msg = "Failed to refresh token."
+                    raise ValueError(msg)
+                delay = backoff.next_delay()
+                logger.warning(
+                    "Failed to refresh stream %s:%s, retrying in %.1f seconds",
+                    self.name,
+                    self.partition,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+    async def open_stream(self: "Stream") -> aiohttp.ClientResponse:
+        """Open a long-lived async HTTP connection to the CrowdStrike Falcon Event Stream.
+
+        Constructs the URL for the event stream using the data feed URL, offset, and
+        event type filter. This URL is used to send a GET request to the server. The
+        aiohttp.ClientSession is not managed within this function, so the caller must
+        ensure that the session is properly closed after usage.
+
+        Returns
+        -------
+        aiohttp.ClientResponse
+            The server's response to the GET request, which is an open streaming
+            connection.
+
+        """
+        event_type_filter = (
+            ""
+            if not self.include_event_types
+            else f"&eventType={','.join(self.include_event_types)}"
+        )
+        if self.resume:
+            # Reconnecting, continue right after the last processed event
+            offset_filter = f"&offset={self.offset + 1}"
+        elif self.latest:
+            offset_filter = "&whence=2"
+        else:
+            offset_filter = f"&offset={self.offset}"
+
+        kwargs = {
+            "url": f"{self.data_feed}{offset_filter}{event_type_filter}",
+            "headers": {
+                "Authorization": f"Token {self.token}",
+            },
+            "raise_for_status": True,
+            "timeout": aiohttp.ClientTimeout(
+                total=None,
+                sock_read=self.read_timeout or None,
+            ),
+        }
+
+        # Make sure a previous connection is not left open when reconnecting
+        if self.spigot:
+            self.spigot.close()
+        self.spigot: aiohttp.ClientResponse = await self.session.get(**kwargs)
+        self.opened_at = time.monotonic()
+        logger.info(
+            "Successfully opened stream %s:%s",
+            self.name,
+            self.partition,
+        )
+        logger.debug("Stream URL: %s", kwargs["url"])
+        return self.spigot
+
+    async def stream_events(
+        self: "Stream",
+        event_filter: EventFilter,
+        checkpoints: Optional[CheckpointStore] = None,
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        """Asynchronously generate events from the CrowdStrike Falcon Event Stream API.
+
+        This method opens a stream to the Falcon API, reads the stream in chunks,
+        decodes each chunk as a batch and yields each event. The stream session is
+        kept alive separately by ``keep_alive``.
+
+        Parameters
+        ----------
+        event_filter: EventFilter
+            The filter deciding which event types are yielded.
+        checkpoints: Optional[CheckpointStore]
+            The store the offset of the last event read from each chunk is
+            committed to, if any.
+
+        Yields
+        ------
+        dict[str, Any]
+            A dictionary containing the event data from the Falcon API and a
+            count of event types seen so far.
+
+        """
+        # Open the stream
+        await self.open_stream()
+        self.decoder.reset()
+        # Per event type counts of the current batch, only kept when recording metrics
+        filtered: Optional[Counter] = Counter() if self.metrics else None
+        received: Counter = Counter()
+        # Asynchronously iterate over the chunks available in the stream
+        async for chunk in self.spigot.content.iter_any():
+            # Drop filtered event types before paying for a full decode
+            lines, skipped_offset = event_filter.prefilter(self.decoder.split(chunk), filtered)
+            if filtered is not None:
+                # Every event is counted as received once, before it is decoded
+                received.update(filtered)
+            # Decode every remaining line in the chunk as a single batch
+            started = time.monotonic()
+            json_events = await self.decoder.decode(lines)
+            if self.metrics and json_events:
+                self.metrics.observe("decode_seconds", time.monotonic() - started, **self.labels)
+            for json_event in json_events:
+                event_type = json_event["metadata"]["eventType"]
+                self.offset = json_event["metadata"]["offset"]
+                self.resume = True
+                if filtered is not None:
+                    received[event_type] += 1
+                # If the event is valid, yield it
+                if self.is_valid_event(event_type, event_filter):
+                    if self.tenant:
+                        cid = self.cid or json_event["metadata"].get("customerIDString")
+                        yield {"falcon": json_event, "cid": cid}
+                    else:
+                        yield {"falcon": json_event}
+                elif filtered is not None:
+                    filtered[event_type] += 1
+            # Account for events that were dropped before decoding
+            if skipped_offset >= 0:
+                self.offset = max(self.offset, skipped_offset)
+                self.resume = True
+            # Every yielded event was sent by now, so checkpoint the last event read
+            # even if the whole chunk was filtered out or deduplicated
+            if checkpoints and self.resume:
+                await checkpoints.commit(self.name, self.partition, self.offset)
+            if filtered is not None:
+                self.record_batch(received, filtered, json_events)
+                received.clear()
+                filtered.clear()
+
+    def record_batch(
+        self: "Stream",
+        received: Counter,
+        filtered: Counter,
+        json_events: list[dict[str, Any]],
+    ) -> None:
+        """Record the metrics of a batch of events read from the stream.
+
+        Parameters
+        ----------
+        received: Counter
+            The number of events read per event type.
+        filtered: Counter
+            The number of events dropped by the filters per event type.
+        json_events: list[dict[str, Any]]
+            The decoded events of the batch.
+
+        """
+        if not self.metrics:
+            return
+        labels = self.labels
+        for name, counts in (
+            ("events_received_total", received),
+            ("events_filtered_total", filtered),
+            ("events_emitted_total", self.emitted),
+        ):
+            for event_type, count in counts.items():
+                self.metrics.inc(name, count, event_type=event_type, **labels)
+        self.emitted.clear()
+        self.metrics.set("offset", self.offset, **labels)
+        if json_events:
+            # eventCreationTime is in milliseconds since the epoch
+            created = json_events[-1]["metadata"].get("eventCreationTime")
+            if created:
+                self.metrics.set("lag_seconds", max(time.time() - created / 1000, 0), **labels)
+
+    def is_valid_event(
+        self: "Stream",
+        event_type: str,
+        event_filter: EventFilter,
+    ) -> bool:
+        """Check if a given event type is valid or not.
+
+        Parameters
+        ----------
+        event_type: str
+            The type of the event to be checked.
+        event_filter: EventFilter
+            The filter deciding which event types are valid.
+
+        Returns
+        -------
+        bool
+            Returns True if the event_type is allowed by the event filter,
+            otherwise returns False.
+
+        """
+        return event_filter.allows(event_type)
+
+
+async def send_event(
+    stream: Stream,
+    flow: FlowControl,
+    event: dict[str, Any],
+    dedup: Optional[Deduplicator] = None,
+) -> None:
+    """Send an event read from a stream partition to the queue unless it is a duplicate.
+
+    Parameters
+    ----------
+    stream: Stream
+        The stream partition the event was read from.
+    flow: FlowControl
+        The rate limited queue to send events to.
+    event: dict[str, Any]
+        The event to send.
+    dedup: Optional[Deduplicator]
+        The deduplicator deciding which events are sent to the queue, if any.
+
+    """
+    labels = stream.labels
+    if dedup:
+        decision = dedup.admit(event, stream)
+        if decision == Deduplicator.DROP and stream.metrics:
+            stream.metrics.inc("events_deduplicated_total", **labels)
+        if decision != Deduplicator.SEND:
+            return
+    started = time.monotonic()
+    await flow.put(event)
+    if stream.metrics:
+        stream.metrics.observe("queue_put_seconds", time.monotonic() - started, **labels)
+        stream.emitted[event["falcon"]["metadata"]["eventType"]] += 1
+
+
+async def consume_stream(
+    stream: Stream,
+    flow: FlowControl,
+    event_filter: EventFilter,
+    checkpoints: Optional[CheckpointStore] = None,
+    backoff: Optional[Backoff] = None,
+    *,
+    dedup: Optional[Deduplicator] = None,
+) -> None:
+    """Drain a single stream partition into the shared event queue.
+
+    Each partition is consumed by its own task so that a long-lived connection
+    on one partition does not prevent the remaining partitions from being read.
+    Dropped connections are reopened from the offset following the last processed
+    event, waiting between attempts according to ``backoff``. The data feed is
+    looked up again when the server rejects the current one.
+
+    Parameters
+    ----------
+    stream: Stream
+        The stream partition to consume.
+    flow: FlowControl
+        The rate limited queue to send events to.
+    event_filter: EventFilter
+        The filter deciding which event types are sent to the queue.
+    checkpoints: Optional[CheckpointStore]
+        The store used to persist the last processed offset, if any.
+    backoff: Optional[Backoff]
+        The reconnection policy. Defaults to retrying forever. Once its attempts
+        are exhausted, the last connection error is raised.
+    dedup: Optional[Deduplicator]
+        The deduplicator deciding which events are sent to the queue, if any.
+
+    """
+    backoff = backoff or Backoff()
+    stale_feed = False
+    while True:
+        opened_at = stream.opened_at
+        try:
+            if stale_feed:
+                await stream.rediscover()
+                stale_feed = False
+            async for event in stream.stream_events(event_filter, checkpoints):
+                await send_event(stream, flow, event, dedup)
+                if checkpoints:
+                    await checkpoints.commit(stream.name, stream.partition, stream.offset)
+            logger.warning(
+                "Stream %s:%s was closed by the server",
+                stream.name,
+                stream.partition,
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if backoff.exhausted:
+                raise
+            logger.warning(
+                "Lost connection to stream %s:%s: %s",
+                stream.name,
+                stream.partition,
+                e,
+            )
+            # The data feed URL or its session token is no longer accepted
+            if 400 <= getattr(e, "status", 0) < 500:  # noqa: PLR2004
+                stale_feed = True
+
+        # A connection that was established before dropping starts a new series
+        if stream.opened_at != opened_at:
+            backoff.reset()
+        delay = backoff.next_delay()
+        if stream.metrics:
+            stream.metrics.inc("reconnects_total", **stream.labels)
+        logger.info(
+            "Reconnecting to stream %s:%s from offset %d in %.1f seconds",
+            stream.name,
+            stream.partition,
+            stream.offset + 1 if stream.resume else stream.offset,
+            delay,
+        )
+        await asyncio.sleep(delay)
+
+
+async def run_stream(
+    stream: Stream,
+    flow: FlowControl,
+    event_filter: EventFilter,
+    checkpoints: Optional[CheckpointStore] = None,
+    backoff: Optional[Backoff] = None,
+    *,
+    dedup: Optional[Deduplicator] = None,
+) -> None:
+    """Consume a stream partition while keeping its session alive in the background.
+
+    Parameters
+    ----------
+    stream: Stream
+        The stream partition to consume.
+    flow: FlowControl
+        The rate limited queue to send events to.
+    event_filter: EventFilter
+        The filter deciding which event types are sent to the queue.
+    checkpoints: Optional[CheckpointStore]
+        The store used to persist the last processed offset, if any.
+    backoff: Optional[Backoff]
+        The reconnection policy.
+    dedup: Optional[Deduplicator]
+        The deduplicator deciding which events are sent to the queue, if any.
+
+    """
+    task_name = f"{stream.name}:{stream.partition}"
+    tasks = [
+        asyncio.create_task(
+            consume_stream(stream, flow, event_filter, checkpoints, backoff, dedup=dedup),
+            name=f"{task_name}:consume",
+        ),
+        asyncio.create_task(stream.keep_alive(), name=f"{task_name}:keep_alive"),
+    ]
+    try:
+        # The session keep-alive never finishes on its own, so this returns once
+        # the partition has been consumed or as soon as either task fails
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def resume_from_checkpoints(
+    streams: list[Stream],
+    checkpoints: CheckpointStore,
+) -> None:
+    """Move each stream to the offset following its last stored checkpoint.
+
+    Parameters
+    ----------
+    streams: list[Stream]
+        The stream partitions to resume.
+    checkpoints: CheckpointStore
+        The store holding the last processed offset of each partition.
+
+    """
+    for stream in streams:
+        stored_offset = checkpoints.load(stream.name, stream.partition)
+        if stored_offset is None:
+            continue
+        stream.offset = stored_offset + 1
+        logger.info(
+            "Resuming stream %s:%s from checkpoint offset %d",
+            stream.name,
+            stream.partition,
+            stream.offset,
+        )
+
+
+async def serve_metrics(metrics: Metrics, host: str, port: int) -> web.AppRunner:
+    """Serve the metrics over HTTP in the Prometheus text format.
+
+    Parameters
+    ----------
+    metrics: Metrics
+        The metrics to serve.
+    host: str
+        The address to listen on.
+    port: int
+        The port to listen on.
+
+    Returns
+    -------
+    web.AppRunner
+        The running server, to be cleaned up by the caller.
+
+    """
+
+    async def handle(_request: web.Request) -> web.Response:
+        return web.Response(
+            body=metrics.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    started = False
+    try:
+        await web.TCPSite(runner, host, port).start()
+        started = True
+    finally:
+        if not started:
+            await runner.cleanup()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return runner
+
+
+def write_metrics(metrics: Metrics, path: str) -> None:
+    """Write the metrics to a file in the Prometheus text format.
+
+    The file is replaced atomically so a collector never reads a partial file.
+
+    Parameters
+    ----------
+    metrics: Metrics
+        The metrics to write.
+    path: str
+        The path of the file.
+
+    """
+    target = Path(path)
+    tmp = target.with_name(f"{target.name}.tmp")
+    tmp.write_text(metrics.render(), encoding="utf-8")
+    tmp.replace(target)
+
+
+async def export_metrics(metrics: Metrics, path: str, interval: float) -> None:
+    """Write the metrics to a file every interval seconds.
+
+    Parameters
+    ----------
+    metrics: Metrics
+        The metrics to write.
+    path: str
+        The path of the file.
+    interval: float
+        The number of seconds between writes.
+
+    """
+    while True:
+        try:
+            write_metrics(metrics, path)
+        except OSError:
+            logger.warning("Unable to write metrics to %s", path, exc_info=True)
+        await asyncio.sleep(interval)
+
+
+def parse_tenants(
+    tenants: list[dict[str, Any]],
+    defaults: dict[str, str],
+) -> list[dict[str, Optional[str]]]:
+    """Resolve the credentials and name of each tenant.
+
+    Parameters
+    ----------
+    tenants: list[dict[str, Any]]
+        The tenants argument. Empty streams from the default credentials only.
+    defaults: dict[str, str]
+        The falcon_client_id, falcon_client_secret and falcon_cloud arguments
+        used for keys missing from a tenant.
+
+    Returns
+    -------
+    list[dict[str, Optional[str]]]
+        The falcon_client_id, falcon_client_secret, falcon_cloud, member_cid and
+        name of each tenant. The name is None when not streaming from tenants.
+
+    Raises
+    ------
+    ValueError
+        If a tenant is invalid or two tenants have the same name.
+
+    """
+    if not tenants:
+        return [{**defaults, "member_cid": None, "name": None}]
+
+    resolved = []
+    for tenant in tenants:
+        if not isinstance(tenant, dict):
+            msg = f"Invalid tenant: {tenant}, must be a dictionary."
+            raise ValueError(msg)  # noqa: TRY004
+        config: dict[str, Optional[str]] = {
+            key: str(tenant.get(key, value)) for key, value in defaults.items()
+        }
+        config["member_cid"] = tenant.get("member_cid")
+        config["name"] = str(
+            tenant.get("name") or config["member_cid"] or config["falcon_client_id"],
+        )
+        if config["falcon_cloud"] not in REGIONS:
+            msg = f"Invalid falcon_cloud for tenant {config['name']}: {config['falcon_cloud']}"
+            raise ValueError(msg)
+        resolved.append(config)
+
+    names = [config["name"] for config in resolved]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        msg = f"Tenant names must be unique, found duplicates: {duplicates}"
+        raise ValueError(msg)
+    return resolved
+
+
+async def list_tenant_streams(client: AIOFalconAPI, stream_name: str) -> list[dict]:
+    """Authenticate a tenant and list its stream partitions.
+
+    Parameters
+    ----------
+    client: AIOFalconAPI
+        The API client of the tenant.
+    stream_name: str
+        The label identifying the connection.
+
+    Returns
+    -------
+    list[dict]
+        The stream resources of the tenant.
+
+    """
+    token = await client.get_token()
+    available_streams = await client.list_available_streams(token, stream_name)
+    return available_streams.get("resources") or []
+
+
+# pylint: disable=too-many-locals,too-many-branches,too-many-statements
+async def main(queue: asyncio.Queue, args: dict[str, Any]) -> None:  # noqa: PLR0912, PLR0915
+    """Entrypoint for the eventstream event_source plugin.
+
+    Parameters
+    ----------
+    queue: asyncio.Queue
+        The queue to send events to
+    args: dict[str, Any]
+        The event_source arguments
+
+    Raises
+    ------
+    ValueError
+        If a argument is invalid
+
+    """
+    falcon_client_id: str = str(args.get("falcon_client_id"))
+    falcon_client_secret: str = str(args.get("falcon_client_secret"))
+    falcon_cloud: str = str(args.get("falcon_cloud", "us-1"))
+    stream_name: str = str(args.get("stream_name", "eda")).lower()
+    tenants: list[dict[str, Any]] = list(args.get("tenants", []))
+    offset: Optional[int] = args.get("offset")
+    latest: bool = bool(args.get("latest", False))
+    delay: float = float(args.get("delay", 0))
+    rate_limit: float = float(args.get("rate_limit", 1 / delay if delay > 0 else 0))
+    rate_limit_burst: int = int(args.get("rate_limit_burst", max(int(rate_limit), 1)))
+    queue_high_water: int = int(args.get("queue_high_water", 0))
+    queue_low_water: int = int(args.get("queue_low_water", queue_high_water // 2))
+    read_timeout: float = float(args.get("read_timeout", 300))
+    max_reconnect_attempts: int = int(args.get("max_reconnect_attempts", 0))
+    reconnect_max_backoff: float = float(args.get("reconnect_max_backoff", 60))
+    connection_limit: int = int(args.get("connection_limit", 100))
+    keepalive_timeout: float = float(args.get("keepalive_timeout", 15))
+    dns_cache_ttl: int = int(args.get("dns_cache_ttl", 10))
+    read_bufsize: Optional[int] = args.get("read_bufsize")
+    use_aiodns: bool = bool(args.get("use_aiodns", False))
+    include_event_types: list[str] = list(args.get("include_event_types", []))
+    exclude_event_types: list[str] = list(args.get("exclude_event_types", []))
+    include_event_patterns: list[str] = list(args.get("include_event_patterns", []))
+    exclude_event_patterns: list[str] = list(args.get("exclude_event_patterns", []))
+    include_event_fields: list[str] = list(args.get("include_event_fields", []))
+    exclude_event_fields: list[str] = list(args.get("exclude_event_fields", []))
+    decode_thread_threshold: int = int(args.get("decode_thread_threshold", 0))
+    checkpoint_path: Optional[str] = args.get("checkpoint_path")
+    checkpoint_backend: str = str(args.get("checkpoint_backend", "file"))
+    checkpoint_flush_events: int = int(args.get("checkpoint_flush_events", 100))
+    checkpoint_flush_interval: float = float(args.get("checkpoint_flush_interval", 5))
+    metrics_port: int = int(args.get("metrics_port", 0))
+    metrics_host: str = str(args.get("metrics_host", "127.0.0.1"))
+    metrics_textfile: Optional[str] = args.get("metrics_textfile")
+    metrics_interval: float = float(args.get("metrics_interval", 15))
+    dedup_fields: list[str] = list(args.get("dedup_fields", []))
+    dedup_window: float = float(args.get("dedup_window", 60))
+    dedup_max_entries: int = int(args.get("dedup_max_entries", 10000))
+    dedup_mode: str = str(args.get("dedup_mode", "first"))
+
+    if falcon_cloud not in REGIONS:
+        msg = f"Invalid falcon_cloud: {falcon_cloud}, must be one of {list(REGIONS.keys())}"
+        raise ValueError(msg)
+
+    tenant_configs = parse_tenants(
+        tenants,
+        {
+            "falcon_client_id": falcon_client_id,
+            "falcon_client_secret": falcon_client_secret,
+            "falcon_cloud": falcon_cloud,
+        },
+    )
+
+    # Offset and latest are mutually exclusive
+    if offset and latest:
+        msg = "'offset' and 'latest' are mutually exclusive parameters."
+        raise ValueError(msg)
+
+    if checkpoint_backend not in CHECKPOINT_BACKENDS:
+        msg = f"Invalid checkpoint_backend: {checkpoint_backend}, must be one of {list(CHECKPOINT_BACKENDS.keys())}"
+        raise ValueError(msg)
+
+    if dedup_mode not in Deduplicator.MODES:
+        msg = f"Invalid dedup_mode: {dedup_mode}, must be one of {list(Deduplicator.MODES)}"
+        raise ValueError(msg)
+
+    if rate_limit < 0 or queue_high_water < 0:
+        msg = "'rate_limit' and 'queue_high_water' must not be negative."
+        raise ValueError(msg)
+
+    # Compile the event type filters once for every partition
+    try:
+        event_filter = EventFilter(
+            exclude_event_types,
+            include_event_patterns,
+            exclude_event_patterns,
+        )
+    except re.error as e:
+        msg = f"Invalid event type pattern: {e}"
+        raise ValueError(msg) from e
+
+    if connection_limit < 0:
+        msg = "'connection_limit' must not be negative."
+        raise ValueError(msg)
+
+    # Every tenant shares the connection pools. Each partition holds a stream
+    # connection while it runs, so auth and refresh requests get a pool of their own.
+    connector_options: dict[str, Any] = {
+        "keepalive_timeout": keepalive_timeout,
+        "dns_cache_ttl": dns_cache_ttl,
+        "use_aiodns": use_aiodns,
+    }
+    connector = create_connector(limit=AIOFalconAPI.API_CONNECTION_LIMIT, **connector_options)
+    stream_connector = create_connector(limit=connection_limit, **connector_options)
+    clients: list[AIOFalconAPI] = [
+        AIOFalconAPI(
+            client_id=str(config["falcon_client_id"]),
+            client_secret=str(config["falcon_client_secret"]),
+            base_url=REGIONS[str(config["falcon_cloud"])],
+            connector=connector,
+            read_bufsize=int(read_bufsize) if read_bufsize else None,
+            member_cid=config["member_cid"],
+            connector_owner=False,
+            stream_connector=stream_connector,
+        )
+        for config in tenant_configs
+    ]
+
+    async def close_clients() -> None:
+        for client in clients:
+            await client.close()
+        await connector.close()
+        await stream_connector.close()
+
+    metrics: Optional[Metrics] = Metrics() if metrics_port or metrics_textfile else None
+    projection: Optional[EventProjection] = (
+        EventProjection(include_event_fields, exclude_event_fields)
+        if include_event_fields or exclude_event_fields
+        else None
+    )
+
+    streams: list[Stream] = []
+    try:
+        # Tenants are set up concurrently, and one that fails does not stop the others
+        tenant_streams = await asyncio.gather(
+            *(list_tenant_streams(client, stream_name) for client in clients),
+            return_exceptions=bool(tenants),
+        )
+        for client, config, resources in zip(clients, tenant_configs, tenant_streams, strict=False):
+            if isinstance(resources, BaseException):
+                logger.error("Unable to list the streams of tenant %s: %s", config["name"], resources)
+                continue
+            streams.extend(
+                Stream(
+                    client,
+                    stream_name,
+                    offset,
+                    latest,
+                    include_event_types,
+                    stream,
+                    decode_thread_threshold,
+                    read_timeout,
+                    metrics,
+                    projection,
+                    tenant=config["name"],
+                    cid=config["member_cid"],
+                )
+                for stream in resources
+            )
+    finally:
+        # Clean up right away if there is nothing to stream from
+        if not streams:
+            await close_clients()
+
+    if not streams:
         logger.info(
             "Unable to open stream, no streams available. Ensure you are using a unique stream_name.",
         )
         return
 
-    streams: list[Stream] = [
-        Stream(falcon, stream_name, offset, latest, include_event_types, stream)
-        for stream in available_streams["resources"]
+    # Partitions past the limit would wait for a connection that is never released
+    if connection_limit and len(streams) > connection_limit:
+        await close_clients()
+        msg = (
+            f"'connection_limit' ({connection_limit}) must be at least the number of "
+            f"stream partitions ({len(streams)}), or 0 to disable the limit."
+        )
+        raise ValueError(msg)
+
+    checkpoints: Optional[CheckpointStore] = None
+    if checkpoint_path:
+        checkpoints = CHECKPOINT_BACKENDS[checkpoint_backend](
+            checkpoint_path,
+            checkpoint_flush_events,
+            checkpoint_flush_interval,
+        )
+        # Only resume automatically if a starting point was not given explicitly
+        if offset is None and not latest:
+            resume_from_checkpoints(streams, checkpoints)
+
+    # Every partition shares the same rate limit and backpressure
+    flow = FlowControl(
+        queue,
+        rate_limit,
+        rate_limit_burst,
+        queue_high_water,
+        queue_low_water,
+    )
+
+    # Serve metrics before any task starts, so a port already in use stops nothing but the plugin
+    metrics_runner: Optional[web.AppRunner] = None
+    if metrics and metrics_port:
+        try:
+            metrics_runner = await serve_metrics(metrics, metrics_host, metrics_port)
+        finally:
+            if not metrics_runner:
+                if checkpoints:
+                    await checkpoints.close()
+                await close_clients()
+
+    # Duplicates are detected across every partition
+    dedup: Optional[Deduplicator] = None
+    aggregator: Optional[asyncio.Task] = None
+    if dedup_fields:
+        dedup = Deduplicator(dedup_fields, dedup_window, dedup_max_entries, dedup_mode)
+        if dedup.aggregate:
+            aggregator = asyncio.create_task(
+                send_aggregated(dedup, flow),
+                name=f"{stream_name}:dedup",
+            )
+
+    # Consume every partition concurrently, each one tracking its own offset
+    tasks: list[asyncio.Task] = [
+        asyncio.create_task(
+            run_stream(
+                stream,
+                flow,
+                event_filter,
+                checkpoints,
+                Backoff(max_reconnect_attempts, reconnect_max_backoff),
+                dedup=dedup,
+            ),
+            name=f"{stream.name}:{stream.partition}",
+        )
+        for stream in streams
     ]
 
+    exporter: Optional[asyncio.Task] = None
+    if metrics and metrics_textfile:
+        exporter = asyncio.create_task(
+            export_metrics(metrics, metrics_textfile, metrics_interval),
+            name=f"{stream_name}:metrics",
+        )
+
     try:
-        # Iterate over each stream in the streams list
-        for stream in streams:
-            async for event in stream.stream_events(exclude_event_types):
-                await queue.put(event)
-                await asyncio.sleep(delay)
+        # Stop as soon as any partition fails so the plugin can shut down cleanly
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
     except asyncio.TimeoutError:
         logger.exception("Timeout occurred while streaming events.")
     except aiohttp.ClientError:
@@ -490,13 +2654,32 @@ async def main(queue: asyncio.Queue, args: dict[str, Any]) -> None:
         logger.exception("Uncaught Plugin Task Error.")
     else:
         logger.info("All streams processed successfully.")
+        # Send the events still held for aggregation
+        if dedup:
+            await send_released(dedup, flow, flush=True)
     finally:
         logger.info("Plugin Task Finished..cleaning up")
+        # Cancel any partitions that are still running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         # Close the stream and API session outside the loop
         for stream in streams:
             if stream.spigot:
-                await stream.spigot.close()
-        await falcon.close()
+                stream.spigot.close()
+        if checkpoints:
+            await checkpoints.close()
+        if aggregator:
+            aggregator.cancel()
+            await asyncio.gather(aggregator, return_exceptions=True)
+        if exporter:
+            exporter.cancel()
+            await asyncio.gather(exporter, return_exceptions=True)
+            # Leave the final values behind for the collector
+            write_metrics(metrics, metrics_textfile)
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await close_clients()
 
 
 if __name__ == "__main__":
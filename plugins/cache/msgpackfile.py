@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2024, CrowdStrike Inc.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = r"""
+name: msgpackfile
+short_description: Compressed MessagePack files
+description:
+  - This cache uses gzip compressed MessagePack files saved to the filesystem.
+  - Lists are stored one item at a time, so they are read and written as a stream instead of
+    being held twice in memory.
+  - Files are written to a temporary file first and then renamed, so readers never see a partial file.
+  - The C(crowdstrike.falcon.falcon_hosts) and C(crowdstrike.falcon.falcon_discover) inventory plugins
+    read and write their hosts one at a time through the C(iter_records) and C(set_records) methods of
+    this plugin, without the JSON encoding that ansible-core 2.19 and later applies to the values of
+    cache plugins. Other values go through the regular cache API.
+version_added: "4.8.0"
+requirements:
+  - msgpack
+options:
+  _uri:
+    required: true
+    description:
+      - Path in which the cache plugin will save the files.
+    env:
+      - name: ANSIBLE_CACHE_PLUGIN_CONNECTION
+    ini:
+      - key: fact_caching_connection
+        section: defaults
+    type: path
+  _prefix:
+    description:
+      - User defined prefix to use when creating the files.
+    env:
+      - name: ANSIBLE_CACHE_PLUGIN_PREFIX
+    ini:
+      - key: fact_caching_prefix
+        section: defaults
+  _timeout:
+    default: 86400
+    description:
+      - Expiration timeout for the cache plugin data.
+    env:
+      - name: ANSIBLE_CACHE_PLUGIN_TIMEOUT
+    ini:
+      - key: fact_caching_timeout
+        section: defaults
+    type: integer
+  compression_level:
+    description:
+      - The gzip compression level, from C(0) (no compression) to C(9) (smallest files).
+    env:
+      - name: ANSIBLE_CACHE_MSGPACKFILE_COMPRESSION_LEVEL
+    ini:
+      - key: compression_level
+        section: cache_msgpackfile
+    type: integer
+    default: 1
+author:
+  - Carlos Matos (@carlosmmatos)
+"""
+
+EXAMPLES = r"""
+# ansible.cfg: cache facts with this plugin
+# [defaults]
+# fact_caching = crowdstrike.falcon.msgpackfile
+# fact_caching_connection = /tmp/ansible_facts
+
+# my_inventory.falcon_hosts.yml: cache the inventory with this plugin
+# plugin: crowdstrike.falcon.falcon_hosts
+# cache: true
+# cache_plugin: crowdstrike.falcon.msgpackfile
+# cache_connection: /tmp/falcon_inventory
+"""
+
+import datetime
+import gzip
+import os
+import tempfile
+import traceback
+from collections.abc import Mapping
+
+from ansible.errors import AnsibleError
+from ansible.plugins.cache import BaseFileCacheModule
+from ansible.utils.display import Display
+
+MSGPACK_IMPORT_ERROR = None
+try:
+    import msgpack
+
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+    MSGPACK_IMPORT_ERROR = traceback.format_exc()
+
+display = Display()
+
+
+class CacheModule(BaseFileCacheModule):
+    """A caching module backed by gzip compressed MessagePack files."""
+
+    # Every file starts with a header telling whether a single value or a list of records follows
+    FORMAT_VERSION = 1
+    VALUE = "value"
+    RECORDS = "records"
+
+    def __init__(self, *args, **kwargs):
+        if not HAS_MSGPACK:
+            raise AnsibleError(
+                "The crowdstrike.falcon.msgpackfile cache plugin requires msgpack to be installed."
+            )
+
+        super().__init__(*args, **kwargs)
+
+    def _load(self, filepath):
+        """Read a value from a file."""
+        with gzip.open(filepath, "rb") as stream:
+            kind, unpacker = self._read_header(stream)
+            try:
+                if kind == self.RECORDS:
+                    return list(unpacker)
+                return unpacker.unpack()
+            except (OSError, EOFError, msgpack.UnpackException) as e:
+                raise ValueError(f"Unable to read {filepath}: {e}") from e
+
+    def _dump(self, value, filepath):
+        """Write a value to a file, storing lists as a stream of records."""
+        if isinstance(value, list):
+            self._write(filepath, self.RECORDS, value)
+        else:
+            self._write(filepath, self.VALUE, [value])
+
+    def iter_records(self, key):
+        """Return an iterator over a cached list, reading one record at a time."""
+        if key in self._cache:
+            return iter(self._cache[key])
+
+        if self.has_expired(key) or key == "":
+            raise KeyError(key)
+
+        cachefile = self._get_cache_file_name(key)
+        try:
+            stream = gzip.open(cachefile, "rb")
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+        # Check the header before any record is read, so a corrupt file is a cache miss
+        try:
+            kind, unpacker = self._read_header(stream)
+        except ValueError as e:
+            stream.close()
+            self._remove_corrupt(key, cachefile, e)
+            raise KeyError(key) from None
+
+        return self._read_records(key, cachefile, stream, kind, unpacker)
+
+    def set_records(self, key, records):
+        """Cache the records of an iterable as they are produced."""
+        # Keeping the records in memory would defeat streaming them
+        self._cache.pop(key, None)
+        self._write(self._get_cache_file_name(key), self.RECORDS, records)
+
+    def _read_header(self, stream):
+        """Return the kind of a file and an unpacker positioned after its header."""
+        unpacker = msgpack.Unpacker(stream, raw=False, strict_map_key=False, max_buffer_size=0)
+        try:
+            header = unpacker.unpack()
+        except (OSError, EOFError, msgpack.UnpackException) as e:
+            raise ValueError(f"Invalid cache file: {e}") from e
+
+        if not isinstance(header, dict) or header.get("version") != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache file header: {header}")
+
+        return header.get("kind"), unpacker
+
+    def _read_records(self, key, cachefile, stream, kind, unpacker):
+        """Yield the records of a file, closing it once done."""
+        with stream:
+            try:
+                if kind == self.RECORDS:
+                    yield from unpacker
+                else:
+                    yield from unpacker.unpack()
+            except (OSError, EOFError, msgpack.UnpackException) as e:
+                # Some records may already have been used, so the run cannot go on without the others
+                self._remove_corrupt(key, cachefile, e)
+                raise AnsibleError(
+                    f"The cache file {cachefile} was corrupt, or did not otherwise contain valid data. "
+                    "It has been removed, so you can re-run your command now."
+                ) from e
+
+    def _remove_corrupt(self, key, cachefile, error):
+        """Warn about a corrupt file and remove it."""
+        display.warning(
+            f"error in '{self.plugin_name}' cache plugin while trying to read {cachefile} : {error}. "
+            "Most likely a corrupt file, so erasing it."
+        )
+        self.delete(key)
+
+    def _write(self, filepath, kind, items):
+        """Atomically write a header and a sequence of objects to a file."""
+        directory, name = os.path.split(filepath)
+        fd, tmpfile = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+        try:
+            packer = msgpack.Packer(default=self._encode, use_bin_type=True)
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.get_option("compression_level")) as stream:
+                    stream.write(packer.pack({"version": self.FORMAT_VERSION, "kind": kind}))
+                    for item in items:
+                        stream.write(packer.pack(item))
+            os.chmod(tmpfile, 0o644)
+            os.replace(tmpfile, filepath)
+        except BaseException:
+            try:
+                os.unlink(tmpfile)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _encode(value):
+        """Convert the values MessagePack cannot store."""
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, Mapping):
+            return dict(value)
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+
+        raise TypeError(f"Unable to cache a value of type {type(value).__name__}")
@@ -61,6 +61,9 @@ options:
     description:
       - Extended headers that are prepended to the default headers dictionary.
     type: dict
+notes:
+  - Set the C(FALCON_TOKEN_CACHE) environment variable to the path of a file to share OAuth2 tokens between
+    tasks, lookups and inventory sources that use the same credentials, instead of requesting a new token each time.
 requirements:
   - python >= 3.6
   - crowdstrike-falconpy >= 1.3.0
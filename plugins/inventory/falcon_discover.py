@@ -65,12 +65,31 @@ options:
       - By default, duplicate hostnames are not allowed.
     type: bool
     default: false
+  max_workers:
+    description:
+      - The maximum number of pages of assets fetched from the API at the same time.
+      - Requests are paused until the rate limit window resets when the API reports that
+        fewer requests remain than this value.
+    type: int
+    default: 4
+  cache_constructed:
+    description:
+      - Cache the constructed inventory instead of the host details.
+      - The hostnames, host variables, including composed ones, and group memberships are cached,
+        so a cache hit adds them to the inventory without evaluating O(compose), O(groups) and
+        O(keyed_groups) again.
+      - The cache is keyed on a hash of the plugin configuration, so changing any option other than
+        O(client_id) and O(client_secret) builds the inventory again.
+      - Requires O(cache) to be enabled.
+    type: bool
+    default: false
 requirements:
   - Assets [B(READ)] API scope
   - python >= 3.6
   - crowdstrike-falconpy >= 1.3.0
 notes:
   - If no credentials are provided, FalconPy will attempt to use the API credentials via environment variables.
+  - Set the C(FALCON_TOKEN_CACHE) environment variable to the path of a file to share OAuth2 tokens with tasks, lookups and other inventory sources.
   - Hostnames are set to the C(hostname) hostvar if it exists, otherwise the IP address is used.
   - The current behavior for assigning an IP address to a host is to use the external IP address if it exists,
     otherwise the current local IP address is used. If neither of those exist, the host is skipped as Ansible
@@ -115,6 +134,9 @@ plugin: crowdstrike.falcon.falcon_discover
 #
 #allow_duplicates: true
 
+# fetch pages of assets with up to 8 concurrent requests
+#max_workers: 8
+
 # place hosts into dynamically created groups based on variable values
 keyed_groups:
   # places host in a group named cloud_<cloud_provider> (e.g. cloud_AWS) if the asset is a cloud asset
@@ -156,6 +178,12 @@ cache_plugin: jsonfile
 cache_connection: /tmp/falcon_inventory
 cache_timeout: 1800
 cache_prefix: falcon_discover
+
+# cache the inventory in compressed MessagePack files (requires msgpack)
+#cache_plugin: crowdstrike.falcon.msgpackfile
+
+# cache the constructed inventory rather than the host details
+#cache_constructed: true
 """
 
 import os
@@ -163,6 +191,8 @@ import re
 import traceback
 
 from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.inventory_utils import FalconInventoryMixin, fetch_pages
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.token_cache import cached_token_credentials
 
 FALCONPY_IMPORT_ERROR = None
 try:
@@ -175,11 +205,13 @@ except ImportError:
     FALCONPY_IMPORT_ERROR = traceback.format_exc()
 
 
-class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+class InventoryModule(FalconInventoryMixin, BaseInventoryPlugin, Constructable, Cacheable):
     """CrowdStrike Falcon Discover dynamic inventory plugin for Ansible."""
 
     NAME = "crowdstrike.falcon.falcon_discover"
 
+    MAX_LIMIT = 100  # Maximum limit allowed by Falcon Discover
+
     def verify_file(self, path):
         """Verify the inventory file."""
         if super().verify_file(path):
@@ -215,25 +247,35 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         # update if the user has caching enabled and the cache is being refreshed; update this value to True if the cache has expired below
         cache_needs_update = user_cache_setting and not cache
 
+        cache_constructed = self.get_option("cache_constructed")
+        # The constructed inventory depends on every option, not only on the inventory source
+        if cache_constructed:
+            cache_key = f"{cache_key}_{self._get_config_hash()}"
+
         # attempt to read the cache if inventory isn't being refreshed and the user has caching enabled
         if attempt_to_read_cache:
             try:
-                host_details = self._cache[cache_key]
+                if cache_constructed:
+                    cached = self._cache[cache_key]
+                else:
+                    cached = self._iter_cached_hosts(self._cache, cache_key)
             except KeyError:
                 # This occurs if the cache_key is not in the cache or if the cache_key expired, so the cache needs to be updated
                 cache_needs_update = True
         if not attempt_to_read_cache or cache_needs_update:
-            # parse the provided inventory source
+            # parse the provided inventory source, hosts are added to the inventory and cached as they are fetched
             falcon = self._authenticate()
             # Get the filter expression
             fql = self.get_option("filter")
             # Get host details
-            host_details = self._get_host_details(falcon, fql)
-        if cache_needs_update:
-            self._cache[cache_key] = host_details
+            host_details = (self._hostvars(host) for host in self._get_host_details(falcon, fql))
 
-        # Add hosts to inventory
-        self._add_host_to_inventory(host_details)
+            # Add hosts to inventory
+            self._add_fetched_hosts(host_details, cache_key, cache_constructed, cache_needs_update)
+        elif cache_constructed:
+            self._add_constructed_inventory(cached)
+        else:
+            self._add_host_to_inventory(cached)
 
     def _credential_setup(self):
         """Setup credentials for FalconPy."""
@@ -265,38 +307,52 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         """Authenticate to the CrowdStrike Falcon API."""
         creds = self._credential_setup()
 
-        return Discover(**creds)
+        return Discover(**cached_token_credentials(creds))
 
     def _get_host_details(self, falcon, fql):
         """Query hosts from Falcon Discover."""
-        max_limit = 100  # Maximum limit allowed by Falcon Discover
-        host_ids = []
-        host_details = []
-        running = True
-        offset = None
-        while running:
-            host_lookup = falcon.query_hosts(filter=fql, offset=offset, limit=max_limit)
-            if host_lookup["status_code"] != 200:
-                raise SystemExit(
-                    f"Unable to query hosts: {host_lookup['body']['errors']}"
-                )
-
-            if host_lookup["body"]["resources"]:
-                host_ids = host_lookup["body"]["resources"]
-            else:
-                # No hosts found
-                return host_details
+        host_ids, total = self._query_host_ids(falcon, fql, None)
+        if not host_ids:
+            # No hosts found
+            return
+
+        def fetch_page(offset):
+            # The IDs of the first page are already known
+            if not offset:
+                return self._get_hosts(falcon, host_ids)
+            return self._get_host_page(falcon, fql, offset)
+
+        # Offsets are numeric, so the first page tells where every other page starts
+        max_workers = max(self.get_option("max_workers"), 1)
+        yield from fetch_pages(fetch_page, range(0, total, self.MAX_LIMIT), max_workers)
+
+    def _query_host_ids(self, falcon, fql, offset):
+        """Return a page of host IDs and the total number of matching hosts."""
+        host_lookup = self._call_api(falcon.query_hosts, filter=fql, offset=offset, limit=self.MAX_LIMIT)
+        if host_lookup["status_code"] != 200:
+            raise SystemExit(
+                f"Unable to query hosts: {host_lookup['body']['errors']}"
+            )
 
-            # Get host details
-            details = falcon.get_hosts(ids=host_ids)["body"]["resources"]
-            host_details.extend(details)
+        return host_lookup["body"]["resources"] or [], host_lookup["body"]["meta"]["pagination"]["total"]
+
+    def _get_host_page(self, falcon, fql, offset):
+        """Get the details of the hosts of a page."""
+        host_ids = self._query_host_ids(falcon, fql, offset)[0]
+        if not host_ids:
+            return []
 
-            # Check if we need to continue
-            offset = host_lookup["body"]["meta"]["pagination"]["offset"] + max_limit
-            if host_lookup["body"]["meta"]["pagination"]["total"] <= len(host_details):
-                running = False
+        return self._get_hosts(falcon, host_ids)
 
-        return host_details
+    def _get_hosts(self, falcon, host_ids):
+        """Get the details of a page of hosts."""
+        details = self._call_api(falcon.get_hosts, ids=host_ids)
+        if details["status_code"] != 200:
+            raise SystemExit(
+                f"Unable to get host details: {details['body']['errors']}"
+            )
+
+        return details["body"]["resources"] or []
 
     def _hostvars(self, host):
         """Return host variables."""
@@ -362,40 +418,42 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
         return hostname
 
-    def _add_host_to_inventory(self, host_details):
-        """Add host to inventory."""
-        for host in host_details:
-            hostvars = self._hostvars(host)
-            # Only process hosts that have an IP address (reachable)?
-            ip_address = self._get_ip_address(hostvars)
-            if not ip_address:
-                continue
-
-            # Get the hostname
-            hostname = self._get_hostname(hostvars, ip_address)
-
-            # Check if we allow duplicate hostnames
-            if self.get_option("allow_duplicates"):
-                # If the hostname already exists, add the asset ID as a suffix
-                if hostname in self.inventory.hosts:
-                    hostname = f"{hostname}_{hostvars['id']}"
-
-            # Add the host to the inventory
-            self.inventory.add_host(hostname)
-            self.inventory.set_variable(hostname, "ansible_host", ip_address)
-
-            # Add host variables
-            for key, value in hostvars.items():
-                self.inventory.set_variable(hostname, key, value)
-
-            # Add host groups
-            strict = self.get_option("strict")
-            self._set_composite_vars(self.get_option("compose"), hostvars, hostname, strict)
-
-            # Create user-defined groups based on variables/jinja2 conditionals
-            self._add_host_to_composed_groups(
-                self.get_option("groups"), hostvars, hostname, strict
-            )
-            self._add_host_to_keyed_groups(
-                self.get_option("keyed_groups"), hostvars, hostname, strict
-            )
+    def _host_adder(self):
+        """Return a function adding a host to inventory."""
+        return self._add_host
+
+    def _add_host(self, hostvars):
+        """Add a host to inventory from its host variables."""
+        # Only process hosts that have an IP address (reachable)?
+        ip_address = self._get_ip_address(hostvars)
+        if not ip_address:
+            return
+
+        # Get the hostname
+        hostname = self._get_hostname(hostvars, ip_address)
+
+        # Check if we allow duplicate hostnames
+        if self.get_option("allow_duplicates"):
+            # If the hostname already exists, add the asset ID as a suffix
+            if hostname in self.inventory.hosts:
+                hostname = f"{hostname}_{hostvars['id']}"
+
+        # Add the host to the inventory
+        self.inventory.add_host(hostname)
+        self.inventory.set_variable(hostname, "ansible_host", ip_address)
+
+        # Add host variables
+        for key, value in hostvars.items():
+            self.inventory.set_variable(hostname, key, value)
+
+        # Add host groups
+        strict = self.get_option("strict")
+        self._set_composite_vars(self.get_option("compose"), hostvars, hostname, strict)
+
+        # Create user-defined groups based on variables/jinja2 conditionals
+        self._add_host_to_composed_groups(
+            self.get_option("groups"), hostvars, hostname, strict
+        )
+        self._add_host_to_keyed_groups(
+            self.get_option("keyed_groups"), hostvars, hostname, strict
+        )
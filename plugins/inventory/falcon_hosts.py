@@ -41,6 +41,17 @@ options:
       - The C(FALCON_MEMBER_CID) environment variable can also be used.
       - This option can be set using a Jinja2 template value.
     type: str
+  member_cids:
+    description:
+      - A list of CrowdStrike member CIDs to query hosts from with the parent credentials, for MSSP authentication.
+      - Use C(all) to query every child CID returned by Flight Control, which requires the
+        Flight Control [B(READ)] API scope.
+      - Each member CID is authenticated separately, and up to O(max_workers) member CIDs are queried at the same time.
+      - Every host keeps the CID it belongs to in its C(cid) host variable, which O(keyed_groups) can use to create a group per CID.
+      - Takes precedence over O(member_cid).
+    type: list
+    elements: str
+    default: []
   cloud:
     description:
       - The CrowdStrike cloud region to use.
@@ -66,6 +77,68 @@ options:
       type: list
       elements: string
       default: ['hostname', 'external_ip', 'local_ip']
+  hostvar_include:
+    description:
+      - A list of host detail fields to keep as host variables.
+      - Shell-style wildcards are supported, for example C(policies*).
+      - The default is to keep every field returned by the API.
+      - Fields are removed before the inventory is cached, which keeps the cache and the inventory small.
+        Refresh the inventory cache with C(--flush-cache) after changing O(hostvar_include),
+        O(hostvar_exclude) or O(hostvar_prefix).
+      - Fields used by O(hostnames), O(compose), O(groups) or O(keyed_groups) must be kept.
+    type: list
+    elements: str
+    default: []
+  hostvar_exclude:
+    description:
+      - A list of host detail fields to remove from the host variables.
+      - Shell-style wildcards are supported, for example C(*_policies).
+      - Applied after O(hostvar_include).
+    type: list
+    elements: str
+    default: []
+  hostvar_prefix:
+    description:
+      - A prefix added to the name of every host variable, for example C(falcon_).
+      - O(hostnames), O(compose), O(groups) and O(keyed_groups) must use the prefixed names.
+    type: str
+    default: ''
+  max_workers:
+    description:
+      - The maximum number of requests sent to the API at the same time, shared by every member CID.
+      - Host IDs keep being queried while the details of the previous pages are being fetched.
+      - Requests are paused until the rate limit window resets when the API reports that
+        fewer requests remain than this value.
+    type: int
+    default: 4
+  incremental:
+    description:
+      - Refresh the inventory incrementally instead of downloading the details of every host.
+      - A snapshot of the hosts is kept in the inventory cache without expiring. When the inventory
+        cache expires, only the details of hosts modified since the latest C(modified_timestamp) of
+        the snapshot, and of hosts new to the filter, are downloaded. Hosts that no longer match
+        the filter are removed.
+      - Requires O(cache) to be enabled with a persistent O(cache_plugin).
+    type: bool
+    default: false
+  incremental_max_age:
+    description:
+      - The number of seconds after which the snapshot is discarded and every host is downloaded again.
+      - This picks up changes to host details that do not update C(modified_timestamp).
+      - Set to C(0) to never download every host again.
+    type: int
+    default: 86400
+  cache_constructed:
+    description:
+      - Cache the constructed inventory instead of the host details.
+      - The hostnames, host variables, including composed ones, and group memberships are cached,
+        so a cache hit adds them to the inventory without evaluating O(hostnames), O(compose),
+        O(groups) and O(keyed_groups) again.
+      - The cache is keyed on a hash of the plugin configuration, so changing any option other than
+        O(client_id) and O(client_secret) builds the inventory again.
+      - Requires O(cache) to be enabled.
+    type: bool
+    default: false
 requirements:
   - Hosts [B(READ)] API scope
   - python >= 3.6
@@ -75,6 +148,7 @@ notes:
     the last one will be used. In this case, consider using the C(device_id) as the first preference in the C(hostnames).
     You can use C(compose) to specify how Ansible will connect to the host with the C(ansible_host) variable.
   - If no credentials are provided, FalconPy will attempt to use the API credentials via environment variables.
+  - Set the C(FALCON_TOKEN_CACHE) environment variable to the path of a file to share OAuth2 tokens with tasks, lookups and other inventory sources.
   - The current behavior is to use the hostname if it exists; otherwise, we will attempt to use either the external
     IP address or the local IP address. If neither of those exist, the host will be skipped as Ansible would not
     be able to connect to it.
@@ -153,6 +227,61 @@ groups:
 #   ansible_user: "'root'"
 #   ansible_ssh_private_key_file: "'/path/to/private_key_file'"
 
+# only keep a few host variables, prefixed with falcon_
+# hostvar_include:
+#   - device_id
+#   - hostname
+#   - external_ip
+#   - local_ip
+#   - platform_name
+#   - tags
+# hostvar_prefix: falcon_
+# hostnames:
+#   - falcon_hostname
+#   - falcon_external_ip
+#   - falcon_local_ip
+# keyed_groups:
+#   - prefix: platform
+#     key: falcon_platform_name
+
+# drop bulky host variables
+# hostvar_exclude:
+#   - policies
+#   - device_policies
+
+# query the hosts of several child CIDs with the parent credentials, and place
+# hosts in a group named cid_<cid> for the CID they belong to
+# member_cids:
+#   - 1234567890abcdef1234567890abcdef
+#   - abcdef1234567890abcdef1234567890
+# keyed_groups:
+#   - prefix: cid
+#     key: cid
+
+# query the hosts of every child CID returned by Flight Control
+# member_cids: all
+
+# fetch host details with up to 8 concurrent requests
+# max_workers: 8
+
+# only download the hosts that changed since the last refresh (requires caching)
+# incremental: true
+# cache: true
+# cache_plugin: jsonfile
+# cache_connection: /tmp/falcon_inventory
+# cache_timeout: 300
+
+# cache the constructed inventory rather than the host details
+# cache: true
+# cache_constructed: true
+# cache_plugin: jsonfile
+# cache_connection: /tmp/falcon_inventory
+
+# cache the inventory in compressed MessagePack files (requires msgpack)
+# cache: true
+# cache_plugin: crowdstrike.falcon.msgpackfile
+# cache_connection: /tmp/falcon_inventory
+
 # Use caching for the inventory
 # cache: true
 # cache_plugin: jsonfile
@@ -163,15 +292,25 @@ groups:
 
 import os
 import re
+import time
 import traceback
+from collections import ChainMap
+from fnmatch import fnmatchcase
+from functools import partial
 
 from ansible.errors import AnsibleError
 from ansible.module_utils.common.text.converters import to_native, to_text
-from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
+from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable, get_cache_plugin
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.inventory_utils import (
+    FalconInventoryMixin,
+    fetch_pages,
+    stream_records,
+)
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.token_cache import cached_token_credentials
 
 FALCONPY_IMPORT_ERROR = None
 try:
-    from falconpy import Hosts
+    from falconpy import FlightControl, Hosts
     from falconpy._version import _VERSION
 
     HAS_FALCONPY = True
@@ -180,11 +319,33 @@ except ImportError:
     FALCONPY_IMPORT_ERROR = traceback.format_exc()
 
 
-class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+class InventoryModule(FalconInventoryMixin, BaseInventoryPlugin, Constructable, Cacheable):
     """CrowdStrike Falcon Hosts dynamic inventory plugin for Ansible."""
 
     NAME = "crowdstrike.falcon.falcon_hosts"
 
+    MAX_LIMIT = 5000  # Maximum limit allowed by Falcon Hosts Query API
+
+    # Expressions evaluated without Jinja2: a variable, or a path of dictionary keys,
+    # optionally compared with a literal
+    SIMPLE_EXPRESSION = re.compile(
+        r"^\s*(?P<path>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s*"
+        r"(?:(?P<operator>==|!=)\s*(?P<literal>'[^'\\]*'|\"[^\"\\]*\"|-?\d+|[Tt]rue|[Ff]alse|[Nn]one)\s*)?$"
+    )
+    SIMPLE_LITERALS = {"true": True, "false": False, "none": None}
+    # Names that Jinja2 resolves to something other than a host variable
+    RESERVED_NAMES = frozenset(
+        ["true", "false", "none", "True", "False", "None", "inventory_hostname", "inventory_hostname_short", "group_names"]
+    )
+
+    def __init__(self):
+        super().__init__()
+        # Host detail field: host variable name, or None if the field is dropped
+        self._hostvar_names = {}
+        # Expression: parsed simple expression, or None if it needs Jinja2
+        self._simple_expressions = {}
+        self._use_simple_expressions = False
+
     def verify_file(self, path):
         """Verify the inventory file."""
         if super().verify_file(path):
@@ -199,6 +360,12 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         self._read_config_data(path)
         cache_key = self.get_cache_key(path)
 
+        # Before ansible-core 2.19, Jinja2 converted results such as numeric strings, so only
+        # skip it when expressions are evaluated natively, and without extra vars
+        self._use_simple_expressions = hasattr(self.templar, "evaluate_expression") and not self.get_option(
+            "use_extra_vars"
+        )
+
         # Check if FalconPy is installed
         if not HAS_FALCONPY:
             raise ImportError(
@@ -220,25 +387,91 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         # update if the user has caching enabled and the cache is being refreshed; update this value to True if the cache has expired below
         cache_needs_update = user_cache_setting and not cache
 
+        cache_constructed = self.get_option("cache_constructed")
+        # The constructed inventory depends on every option, not only on the inventory source
+        inventory_cache_key = f"{cache_key}_{self._get_config_hash()}" if cache_constructed else cache_key
+
         # attempt to read the cache if inventory isn't being refreshed and the user has caching enabled
         if attempt_to_read_cache:
             try:
-                host_details = self._cache[cache_key]
+                if cache_constructed:
+                    cached = self._cache[inventory_cache_key]
+                else:
+                    cached = self._iter_cached_hosts(self._cache, inventory_cache_key)
             except KeyError:
                 # This occurs if the cache_key is not in the cache or if the cache_key expired, so the cache needs to be updated
                 cache_needs_update = True
         if not attempt_to_read_cache or cache_needs_update:
-            # parse the provided inventory source
-            falcon = self._authenticate()
-            # Get the filter expression
-            fql = self.get_option("filter")
-            # Get host details
-            host_details = self._get_host_details(falcon, fql)
-        if cache_needs_update:
-            self._cache[cache_key] = host_details
-
-        # Add hosts to inventory
-        self._add_host_to_inventory(host_details)
+            # parse the provided inventory source, hosts are added to the inventory and cached as they are fetched
+            host_details = self._query_hosts(cache_key, incremental=user_cache_setting and self.get_option("incremental"))
+
+            # Add hosts to inventory
+            self._add_fetched_hosts(host_details, inventory_cache_key, cache_constructed, cache_needs_update)
+        elif cache_constructed:
+            self._add_constructed_inventory(cached)
+        else:
+            self._add_host_to_inventory(cached)
+
+    def _query_hosts(self, cache_key, incremental):
+        """Return the host variables of the hosts matching the filter."""
+        # Get the filter expression
+        fql = self.get_option("filter")
+        if self.get_option("incremental") and not incremental:
+            self.display.warning("falcon_hosts: incremental refresh requires caching to be enabled.")
+
+        if self.get_option("member_cids"):
+            return self._query_member_cids(fql, cache_key, incremental)
+
+        falcon = self._authenticate()
+        return self._query_falcon_hosts(falcon, fql, cache_key, incremental)
+
+    def _query_falcon_hosts(self, falcon, fql, cache_key, incremental):
+        """Return the host variables of the hosts of a CID matching the filter."""
+        # Get host details
+        if incremental:
+            return self._get_incremental_host_details(falcon, fql, cache_key)
+
+        return (self._hostvars(host) for host in self._get_host_details(falcon, fql))
+
+    def _query_member_cids(self, fql, cache_key, incremental):
+        """Return the host variables of the hosts of every member CID, querying them in parallel."""
+        creds = self._credential_setup()
+        creds.pop("member_cid", None)
+
+        member_cids = self.get_option("member_cids")
+        if "all" in member_cids:
+            member_cids = self._get_child_cids(FlightControl(**cached_token_credentials(creds)))
+
+        max_workers = max(self.get_option("max_workers"), 1)
+        # Hand the hosts over in the order of the member CIDs, buffering up to a page of hosts per member CID
+        query_member_cid = partial(self._query_member_cid, creds, fql=fql, cache_key=cache_key, incremental=incremental)
+        return stream_records(query_member_cid, member_cids, max_workers, self.MAX_LIMIT)
+
+    def _query_member_cid(self, creds, member_cid, fql, cache_key, incremental):
+        """Return the host variables of the hosts of a member CID matching the filter."""
+        falcon = Hosts(**cached_token_credentials(dict(creds, member_cid=member_cid)))
+        # Each member CID keeps its own incremental snapshot
+        return self._query_falcon_hosts(falcon, fql, f"{cache_key}_{member_cid}", incremental)
+
+    def _get_child_cids(self, falcon):
+        """Query the Flight Control child CIDs of the parent CID."""
+        child_cids = []
+        offset = None
+        while True:
+            child_lookup = self._call_api(falcon.query_children, offset=offset, limit=1000)
+            if child_lookup["status_code"] != 200:
+                raise SystemExit(
+                    f"Unable to query child CIDs: {child_lookup['body']['errors']}"
+                )
+
+            if not child_lookup["body"]["resources"]:
+                return child_cids
+            child_cids.extend(child_lookup["body"]["resources"])
+
+            # Check if we need to continue
+            offset = child_lookup["body"]["meta"]["pagination"]["offset"]
+            if child_lookup["body"]["meta"]["pagination"]["total"] <= len(child_cids):
+                return child_cids
 
     def _credential_setup(self):
         """Setup credentials for FalconPy."""
@@ -281,47 +514,252 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
         """Authenticate to the CrowdStrike Falcon API."""
         creds = self._credential_setup()
 
-        return Hosts(**creds)
+        return Hosts(**cached_token_credentials(creds))
 
     def _get_host_details(self, falcon, fql):
-        """Query hosts from Falcon Discover."""
-        max_limit = 5000  # Maximum limit allowed by Falcon Hosts Query API
-        host_ids = []
-        host_details = []
-        running = True
+        """Query hosts from Falcon Hosts."""
+        return self._fetch_device_details(falcon, self._scroll_host_ids(falcon, fql))
+
+    def _scroll_host_ids(self, falcon, fql):
+        """Yield pages of host IDs matching a filter."""
+        total_ids = 0
         offset = None
-        while running:
-            host_lookup = falcon.query_devices_by_filter_scroll(filter=fql, offset=offset, limit=max_limit)
+        while True:
+            host_lookup = self._call_api(
+                falcon.query_devices_by_filter_scroll, filter=fql, offset=offset, limit=self.MAX_LIMIT
+            )
             if host_lookup["status_code"] != 200:
                 raise SystemExit(
                     f"Unable to query hosts: {host_lookup['body']['errors']}"
                 )
 
-            if host_lookup["body"]["resources"]:
-                host_ids = host_lookup["body"]["resources"]
-            else:
-                # No hosts found
-                return host_details
+            host_ids = host_lookup["body"]["resources"]
+            if not host_ids:
+                # No more hosts found
+                return
 
-            # Get host details
-            details = falcon.get_device_details(ids=host_ids)["body"]["resources"]
-            host_details.extend(details)
+            yield host_ids
+            total_ids += len(host_ids)
 
             # Check if we need to continue
             offset = host_lookup["body"]["meta"]["pagination"]["offset"]
-            if host_lookup["body"]["meta"]["pagination"]["total"] <= len(host_details):
-                running = False
+            if host_lookup["body"]["meta"]["pagination"]["total"] <= total_ids:
+                return
+
+    def _fetch_device_details(self, falcon, id_pages):
+        """Yield the details of pages of host IDs fetched in parallel, keeping their order."""
+        max_workers = max(self.get_option("max_workers"), 1)
+        # Keep scrolling through host IDs while earlier pages are fetched in the background
+        return fetch_pages(partial(self._get_device_details, falcon), id_pages, max_workers)
+
+    def _load_snapshot_cache(self):
+        """Load a cache that never expires, to hold the incremental snapshot."""
+        cache_options = {"_timeout": 0}
+        for option, setting in (("_uri", "cache_connection"), ("_prefix", "cache_prefix")):
+            if self.get_option(setting) is not None:
+                cache_options[option] = self.get_option(setting)
+
+        return get_cache_plugin(self.get_option("cache_plugin"), **cache_options)
+
+    def _get_incremental_host_details(self, falcon, fql, cache_key):
+        """Query hosts, only downloading the details of hosts changed since the last snapshot."""
+        snapshot_cache = self._load_snapshot_cache()
+        snapshot_key = f"{cache_key}_snapshot"
+        try:
+            snapshot = snapshot_cache[snapshot_key]
+        except KeyError:
+            snapshot = None
+
+        projection = self._hostvar_projection()
+        if self._is_snapshot_usable(snapshot, fql, projection):
+            hosts, watermark = self._get_changed_host_details(falcon, fql, snapshot)
+            created = snapshot["created"]
+        else:
+            hosts, watermark = self._project_hosts(self._get_host_details(falcon, fql))
+            created = time.time()
+
+        snapshot = {
+            "filter": fql,
+            "hostvars": projection,
+            "created": created,
+            "watermark": watermark,
+            "hosts": hosts,
+        }
+        snapshot_cache[snapshot_key] = snapshot
+        snapshot_cache.update_cache_if_changed()
+
+        return list(hosts.values())
+
+    def _project_hosts(self, host_details, watermark=""):
+        """Return the host variables of hosts by device ID, and their latest modified_timestamp."""
+        hosts = {}
+        for host in host_details:
+            hosts[host["device_id"]] = self._hostvars(host)
+            # modified_timestamp is an ISO 8601 UTC string, so the latest one sorts last
+            watermark = max(watermark, host.get("modified_timestamp") or "")
+
+        return hosts, watermark
+
+    def _is_snapshot_usable(self, snapshot, fql, projection):
+        """Return whether hosts can be refreshed incrementally from a snapshot."""
+        if not snapshot or not snapshot.get("watermark") or snapshot.get("filter") != fql:
+            return False
+
+        # The snapshot only holds the host variables of its own projection
+        if snapshot.get("hostvars") != projection:
+            return False
+
+        max_age = self.get_option("incremental_max_age")
+        return not max_age or time.time() - snapshot["created"] <= max_age
+
+    def _get_changed_host_details(self, falcon, fql, snapshot):
+        """Merge the hosts changed since a snapshot into it."""
+        known = snapshot["hosts"]
+
+        # Listing every matching ID drops the hosts that no longer match the filter
+        current_ids = [host_id for page in self._scroll_host_ids(falcon, fql) for host_id in page]
+
+        changed_fql = f"modified_timestamp:>='{snapshot['watermark']}'"
+        if fql:
+            changed_fql = f"({fql})+{changed_fql}"
+        changed_ids = {host_id for page in self._scroll_host_ids(falcon, changed_fql) for host_id in page}
+
+        stale_ids = [host_id for host_id in current_ids if host_id in changed_ids or host_id not in known]
+        id_pages = (stale_ids[i:i + self.MAX_LIMIT] for i in range(0, len(stale_ids), self.MAX_LIMIT))
+        changed, watermark = self._project_hosts(self._fetch_device_details(falcon, id_pages), snapshot["watermark"])
+        known.update(changed)
+
+        return {host_id: known[host_id] for host_id in current_ids if host_id in known}, watermark
+
+    def _get_device_details(self, falcon, host_ids):
+        """Get the details of a page of hosts."""
+        details = self._call_api(falcon.get_device_details, ids=host_ids)
+        if details["status_code"] != 200:
+            raise SystemExit(
+                f"Unable to get host details: {details['body']['errors']}"
+            )
 
-        return host_details
+        return details["body"]["resources"] or []
+
+    def _hostvar_projection(self):
+        """Return the options selecting and naming host variables."""
+        return {
+            "include": self.get_option("hostvar_include"),
+            "exclude": self.get_option("hostvar_exclude"),
+            "prefix": self.get_option("hostvar_prefix"),
+        }
+
+    def _hostvar_name(self, key):
+        """Return the host variable name of a host detail field, or None to drop it."""
+        include = self.get_option("hostvar_include")
+        exclude = self.get_option("hostvar_exclude")
+        if include and not any(fnmatchcase(key, pattern) for pattern in include):
+            return None
+        if any(fnmatchcase(key, pattern) for pattern in exclude):
+            return None
+
+        return f"{self.get_option('hostvar_prefix') or ''}{key}"
 
     def _hostvars(self, host):
         """Return host variables."""
         hostvars = {}
         for key, value in host.items():
-            hostvars[key] = value
+            # Every host has the same fields, so match the patterns once per field
+            try:
+                name = self._hostvar_names[key]
+            except KeyError:
+                name = self._hostvar_names[key] = self._hostvar_name(key)
+            if name is not None:
+                hostvars[name] = value
 
         return hostvars
 
+    def _parse_simple_expression(self, template):
+        """Return the parts of an expression that can be evaluated without Jinja2, or None."""
+        if not self._use_simple_expressions or not isinstance(template, str):
+            return None
+
+        try:
+            return self._simple_expressions[template]
+        except KeyError:
+            pass
+
+        expression = None
+        match = self.SIMPLE_EXPRESSION.match(template)
+        if match:
+            path = match.group("path").split(".")
+            literal = match.group("literal")
+            if literal is None:
+                pass
+            elif literal[0] in "'\"":
+                literal = literal[1:-1]
+            elif literal.lower() in self.SIMPLE_LITERALS:
+                literal = self.SIMPLE_LITERALS[literal.lower()]
+            else:
+                literal = int(literal)
+            if path[0] not in self.RESERVED_NAMES:
+                expression = (path, match.group("operator"), literal)
+
+        self._simple_expressions[template] = expression
+        return expression
+
+    def _evaluate_simple_expression(self, expression, variables):
+        """Evaluate a simple expression, raising KeyError if it needs Jinja2."""
+        path, operator, literal = expression
+        value = variables[path[0]]
+        for key in path[1:]:
+            # Jinja2 looks up attributes before keys, as in dict.items
+            if not isinstance(value, dict) or hasattr(value, key):
+                raise KeyError(key)
+            value = value[key]
+
+        if operator == "==":
+            return value == literal
+        if operator == "!=":
+            return value != literal
+        return value
+
+    def _compose(self, template, variables, *args, **kwargs):
+        """Compose a value, evaluating simple expressions without Jinja2."""
+        expression = self._parse_simple_expression(template)
+        if expression:
+            try:
+                return self._evaluate_simple_expression(expression, variables)
+            except KeyError:
+                pass
+
+        return super()._compose(template, variables, *args, **kwargs)
+
+    def _add_host_to_composed_groups(self, groups, variables, host, strict=False, fetch_hostvars=True):
+        """Add a host to groups, evaluating simple comparisons without Jinja2."""
+        if not self._use_simple_expressions or not groups or not isinstance(groups, dict):
+            super()._add_host_to_composed_groups(groups, variables, host, strict, fetch_hostvars)
+            return
+
+        # Host variables, including composed ones, take precedence like in Jinja2
+        lookup = ChainMap(self.inventory.get_host(host).vars, variables) if fetch_hostvars else variables
+
+        # Keep the order of the groups, passing runs of other conditionals to Jinja2
+        pending = {}
+        for group_name, conditional in groups.items():
+            expression = self._parse_simple_expression(conditional)
+            if expression and expression[1]:
+                try:
+                    result = self._evaluate_simple_expression(expression, lookup)
+                except KeyError:
+                    pass
+                else:
+                    if pending:
+                        super()._add_host_to_composed_groups(pending, variables, host, strict, fetch_hostvars)
+                        pending = {}
+                    if result:
+                        self.inventory.add_child(self.inventory.add_group(self._sanitize_group_name(group_name)), host)
+                    continue
+            pending[group_name] = conditional
+
+        if pending:
+            super()._add_host_to_composed_groups(pending, variables, host, strict, fetch_hostvars)
+
     def _get_hostname(self, hostvars, hostnames=None, strict=False):
         """Return the hostname for a host."""
         hostname = None
@@ -348,31 +786,30 @@ class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
             )
         )
 
-    def _add_host_to_inventory(self, host_details):
-        """Add host to inventory."""
-        strict = self.get_option("strict")
-        hostnames = self.get_option("hostnames")
-
-        for host in host_details:
-            hostvars = self._hostvars(host)
+    def _host_adder(self):
+        """Return a function adding a host to inventory."""
+        # Host details were projected into host variables before being cached
+        return partial(self._add_host, hostnames=self.get_option("hostnames"), strict=self.get_option("strict"))
 
-            # Get the hostname
-            hostname = self._get_hostname(hostvars, hostnames, strict)
+    def _add_host(self, hostvars, hostnames, strict):
+        """Add a host to inventory."""
+        # Get the hostname
+        hostname = self._get_hostname(hostvars, hostnames, strict)
 
-            # Add the host to the inventory
-            self.inventory.add_host(hostname)
+        # Add the host to the inventory
+        self.inventory.add_host(hostname)
 
-            # Add host variables
-            for key, value in hostvars.items():
-                self.inventory.set_variable(hostname, key, value)
+        # Add host variables
+        for key, value in hostvars.items():
+            self.inventory.set_variable(hostname, key, value)
 
-            # Create composite vars
-            self._set_composite_vars(self.get_option("compose"), hostvars, hostname, strict)
+        # Create composite vars
+        self._set_composite_vars(self.get_option("compose"), hostvars, hostname, strict)
 
-            # Create user-defined groups based on variables/jinja2 conditionals
-            self._add_host_to_composed_groups(
-                self.get_option("groups"), hostvars, hostname, strict
-            )
-            self._add_host_to_keyed_groups(
-                self.get_option("keyed_groups"), hostvars, hostname, strict
-            )
+        # Create user-defined groups based on variables/jinja2 conditionals
+        self._add_host_to_composed_groups(
+            self.get_option("groups"), hostvars, hostname, strict
+        )
+        self._add_host_to_keyed_groups(
+            self.get_option("keyed_groups"), hostvars, hostname, strict
+        )
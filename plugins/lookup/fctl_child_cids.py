@@ -24,6 +24,12 @@ options:
     description:
       - Optionally pass in a secondary parent CID to limit the results.
       - If no terms are passed in, all child CIDs associated with the parent credentials will be returned.
+  max_workers:
+    description:
+      - The maximum number of secondary parent CIDs queried at the same time.
+      - All secondary parent CIDs are queried with the same API client, and their results are returned in the order of the terms.
+    type: int
+    default: 4
 
 extends_documentation_fragment:
   - crowdstrike.falcon.credentials
@@ -63,9 +69,11 @@ _raw:
 
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from ansible.errors import AnsibleError
 from ansible.plugins.lookup import LookupBase
 from ansible.utils.display import Display
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.token_cache import cached_token_credentials
 
 
 FALCONPY_IMPORT_ERROR = None
@@ -123,7 +131,7 @@ class LookupModule(LookupBase):
         """Authenticate to the CrowdStrike Falcon API."""
         creds = self._credential_setup()
 
-        return FlightControl(**creds)
+        return FlightControl(**cached_token_credentials(creds))
 
     def _get_child_cids(self, falcon, term):
         """Fetch Flight Control child CIDs based on the provided filter expression."""
@@ -150,6 +158,26 @@ class LookupModule(LookupBase):
 
         return child_cids
 
+    def _query_terms(self, falcon, terms):
+        """Fetch the child CIDs of secondary parent CIDs in parallel, keeping their order."""
+        max_workers = max(self.get_option("max_workers"), 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._get_child_cids, falcon, f"cid:'{term}'") for term in terms]
+
+        results = []
+        errors = []
+        for term, future in zip(terms, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(f"'{term}': {e}")
+
+        # Report every failing secondary parent CID instead of the first one
+        if errors:
+            raise AnsibleError(f"Failed to fetch child CIDs: {'; '.join(errors)}")
+
+        return results
+
     def run(self, terms, variables=None, **kwargs):
         """Fetch host IDs based on the provided filter expression."""
 
@@ -179,14 +207,11 @@ class LookupModule(LookupBase):
                 raise AnsibleError(f"Failed to fetch child CIDs: {e}") from e
         else:
             for term in terms:
-                # Fetch child CIDs based on the provided filter expression
                 cid_term = f"cid:'{term}'"
                 display.debug(f"Fetching child CIDs with filter expression: {cid_term}")
-                try:
-                    # Fetch child CIDs based on the provided filter expression
-                    display.vvv(f"FQL Filter used: {cid_term}")
-                    ret.append(self._get_child_cids(falcon, cid_term))
-                except Exception as e:  # pylint: disable=broad-except
-                    raise AnsibleError(f"Failed to fetch child CIDs: {e}") from e
+                display.vvv(f"FQL Filter used: {cid_term}")
+
+            # Fetch child CIDs based on the provided filter expressions
+            ret = self._query_terms(falcon, terms)
 
         return ret
@@ -27,6 +27,38 @@ options:
       - The filter expression that should be used to limit the results using FQL (Falcon Query Language) syntax.
       - See the L(Falcon documentation,https://falcon.crowdstrike.com/documentation/page/c0b16f1b/host-and-host-group-management-apis#qadd6f8f)
         for more information about the available filters.
+  max_workers:
+    description:
+      - The maximum number of filter expressions queried at the same time.
+      - All filter expressions are queried with the same API client, and their results are returned in the order of the terms.
+    type: int
+    default: 4
+  cache_ttl:
+    description:
+      - The number of seconds to cache the host IDs returned for a filter expression.
+      - Results are cached per filter expression, client ID, cloud and member CID, so evaluating the lookup again
+        with the same filter does not query the API again until they expire.
+      - Without O(cache_plugin), results are only cached in memory by the process evaluating the lookup,
+        for up to 1000 filter expressions.
+      - Set to C(0) to disable caching.
+    type: int
+    default: 0
+    env:
+      - name: FALCON_HOST_IDS_CACHE_TTL
+  cache_plugin:
+    description:
+      - The cache plugin used to share cached results between tasks, hosts and runs, for example C(ansible.builtin.jsonfile).
+      - Requires O(cache_ttl) to be set.
+    type: str
+    env:
+      - name: FALCON_HOST_IDS_CACHE_PLUGIN
+  cache_connection:
+    description:
+      - The connection string of O(cache_plugin), for example the directory used by C(ansible.builtin.jsonfile).
+      - The connection configured for the fact cache is used if not specified.
+    type: str
+    env:
+      - name: FALCON_HOST_IDS_CACHE_CONNECTION
 
 extends_documentation_fragment:
   - crowdstrike.falcon.credentials
@@ -59,6 +91,14 @@ EXAMPLES = r"""
           'platform_name:"Linux"
           + reduced_functionality_mode:"yes"')
       }}
+
+- name: Reuse the host IDs of a filter for 10 minutes across tasks and hosts
+  ansible.builtin.debug:
+    msg: >
+      {{
+        lookup('crowdstrike.falcon.host_ids', 'platform_name:"Linux"',
+          cache_ttl=600, cache_plugin='ansible.builtin.jsonfile', cache_connection='/tmp/falcon_host_ids')
+      }}
 """
 
 RETURN = r"""
@@ -70,11 +110,17 @@ _raw:
   elements: str
 """
 
+import hashlib
+import json
 import os
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from ansible.errors import AnsibleError
+from ansible.plugins.loader import cache_loader
 from ansible.plugins.lookup import LookupBase
 from ansible.utils.display import Display
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.token_cache import cached_token_credentials
 
 
 FALCONPY_IMPORT_ERROR = None
@@ -89,6 +135,11 @@ except ImportError:
 
 display = Display()
 
+# Cache key: expiration time and host IDs, shared by the lookups evaluated in this process
+CACHED_HOST_IDS = {}
+# Number of filter expressions kept in CACHED_HOST_IDS before the oldest ones are dropped
+MAX_CACHED_FILTERS = 1000
+
 
 class LookupModule(LookupBase):
     """Lookup plugin for fetching host IDs based on filter expressions."""
@@ -132,7 +183,7 @@ class LookupModule(LookupBase):
         """Authenticate to the CrowdStrike Falcon API."""
         creds = self._credential_setup()
 
-        return Hosts(**creds)
+        return Hosts(**cached_token_credentials(creds))
 
     def _get_device_ids(self, falcon, term):
         """Fetch host IDs based on the provided filter expression."""
@@ -159,6 +210,89 @@ class LookupModule(LookupBase):
 
         return host_ids
 
+    def _get_cache_key(self, term):
+        """Return the cache key of the host IDs matching a filter expression."""
+        creds = self._credential_setup()
+        # Different API clients may see different hosts, the key is a hash so the client ID is not stored
+        scope = [term, creds["client_id"], creds.get("base_url", "us-1"), creds.get("member_cid", "")]
+
+        return f"host_ids_{hashlib.sha256(json.dumps(scope).encode('utf-8')).hexdigest()}"
+
+    def _get_result_cache(self):
+        """Load the cache plugin persisting results, or return None if there is none."""
+        if not self.get_option("cache_plugin"):
+            return None
+
+        cache_options = {"_timeout": self.get_option("cache_ttl")}
+        if self.get_option("cache_connection"):
+            cache_options["_uri"] = self.get_option("cache_connection")
+
+        return cache_loader.get(self.get_option("cache_plugin"), **cache_options)
+
+    def _read_cached_device_ids(self, term, result_cache):
+        """Return the cached host IDs matching a filter expression, or None if they are not cached."""
+        if self.get_option("cache_ttl") <= 0:
+            return None
+
+        key = self._get_cache_key(term)
+        expires, host_ids = CACHED_HOST_IDS.get(key, (0, None))
+        if expires > time.time():
+            return list(host_ids)
+
+        if result_cache is None:
+            return None
+
+        try:
+            host_ids = result_cache.get(key)
+        except KeyError:
+            return None
+
+        self._remember_device_ids(key, host_ids)
+        return list(host_ids)
+
+    def _write_cached_device_ids(self, term, host_ids, result_cache):
+        """Cache the host IDs matching a filter expression."""
+        if self.get_option("cache_ttl") <= 0:
+            return
+
+        key = self._get_cache_key(term)
+        self._remember_device_ids(key, host_ids)
+        if result_cache is not None:
+            result_cache.set(key, host_ids)
+
+    def _remember_device_ids(self, key, host_ids):
+        """Keep host IDs in memory, dropping expired and then the oldest entries to stay under MAX_CACHED_FILTERS."""
+        now = time.time()
+        for expired_key in [cached_key for cached_key, (expires, _) in CACHED_HOST_IDS.items() if expires <= now]:
+            del CACHED_HOST_IDS[expired_key]
+
+        # Entries are kept in the order they were written
+        CACHED_HOST_IDS.pop(key, None)
+        while len(CACHED_HOST_IDS) >= MAX_CACHED_FILTERS:
+            del CACHED_HOST_IDS[next(iter(CACHED_HOST_IDS))]
+
+        CACHED_HOST_IDS[key] = (now + self.get_option("cache_ttl"), list(host_ids))
+
+    def _query_terms(self, falcon, terms):
+        """Fetch the host IDs of filter expressions in parallel, keeping their order."""
+        max_workers = max(self.get_option("max_workers"), 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._get_device_ids, falcon, term) for term in terms]
+
+        results = []
+        errors = []
+        for term, future in zip(terms, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(f"'{term}': {e}")
+
+        # Report every failing filter expression instead of the first one
+        if errors:
+            raise AnsibleError(f"Failed to fetch host IDs: {'; '.join(errors)}")
+
+        return results
+
     def run(self, terms, variables=None, **kwargs):
         """Fetch host IDs based on the provided filter expression."""
 
@@ -176,16 +310,23 @@ class LookupModule(LookupBase):
 
         self.set_options(var_options=variables, direct=kwargs)
 
-        falcon = self._authenticate()
-        ret = []
+        result_cache = self._get_result_cache() if self.get_option("cache_ttl") > 0 else None
+        ret = [self._read_cached_device_ids(term, result_cache) for term in terms]
 
-        for term in terms:
-            display.debug(f"Fetching host IDs with filter expression: {term}")
-            try:
-                # Fetch host IDs based on the provided filter expression
-                display.vvv(f"FQL Filter used: {term}")
-                ret.append(self._get_device_ids(falcon, term))
-            except Exception as e:  # pylint: disable=broad-except
-                raise AnsibleError(f"Failed to fetch host IDs: {e}") from e
+        # Only authenticate if some results are not cached
+        missing = [index for index, host_ids in enumerate(ret) if host_ids is None]
+        if not missing:
+            return ret
+
+        for index in missing:
+            display.debug(f"Fetching host IDs with filter expression: {terms[index]}")
+            display.vvv(f"FQL Filter used: {terms[index]}")
+
+        falcon = self._authenticate()
+        # Fetch host IDs based on the provided filter expressions
+        results = self._query_terms(falcon, [terms[index] for index in missing])
+        for index, host_ids in zip(missing, results):
+            self._write_cached_device_ids(terms[index], host_ids, result_cache)
+            ret[index] = host_ids
 
         return ret
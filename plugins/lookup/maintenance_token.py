@@ -66,6 +66,7 @@ import traceback
 from ansible.errors import AnsibleError
 from ansible.plugins.lookup import LookupBase
 from ansible.utils.display import Display
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.token_cache import cached_token_credentials
 
 
 FALCONPY_IMPORT_ERROR = None
@@ -123,7 +124,7 @@ class LookupModule(LookupBase):
         """Authenticate to the CrowdStrike Falcon API."""
         creds = self._credential_setup()
 
-        return SensorUpdatePolicy(**creds)
+        return SensorUpdatePolicy(**cached_token_credentials(creds))
 
     def _fetch_token(self, falcon, device_id):
         """Fetch maintenance token"""
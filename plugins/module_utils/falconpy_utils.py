@@ -7,6 +7,9 @@
 
 from __future__ import absolute_import, division, print_function
 
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.token_cache import (
+    cached_token_credentials,
+)
 from ansible_collections.crowdstrike.falcon.plugins.module_utils.version import (
     __version__,
 )
@@ -100,7 +103,7 @@ def authenticate(module, service_class):
             base_url=module.params["auth"]["cloud"],
         )
     else:
-        service = service_class(**get_falconpy_credentials(module))
+        service = service_class(**cached_token_credentials(get_falconpy_credentials(module)))
 
     return service
 
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+# Common helpers for the Falcon inventory plugins.
+# Copyright: (c) 2025, CrowdStrike Inc.
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+__metaclass__ = type
+
+
+def fetch_pages(fetch_page, items, max_workers):
+    """Yield the records of pages fetched in parallel, keeping the order of the items they are fetched from.
+
+    Items are consumed lazily and only the pages being fetched are held in memory.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = deque()
+        for item in items:
+            pages.append(executor.submit(fetch_page, item))
+            # Hand the oldest page over once every worker is busy
+            if len(pages) > max_workers:
+                yield from pages.popleft().result()
+
+        while pages:
+            yield from pages.popleft().result()
+
+
+def stream_records(produce, items, max_workers, buffer_size):
+    """Yield the records produced for several items in parallel, keeping the order of the items.
+
+    Each item is produced by a generator in a worker thread, handing its records over through a
+    queue of buffer_size records, so items are never held in memory as a whole.
+    """
+    stopped = threading.Event()
+
+    def put(records, entry):
+        # Give up once the records are no longer read
+        while not stopped.is_set():
+            try:
+                records.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(item, records):
+        try:
+            for record in produce(item):
+                if not put(records, (True, record)):
+                    return
+        finally:
+            put(records, (False, None))
+
+    def drain(future, records):
+        while True:
+            is_record, record = records.get()
+            if not is_record:
+                # Raise the error of the worker, if any
+                future.result()
+                return
+            yield record
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            streams = deque()
+            for item in items:
+                records = queue.Queue(buffer_size)
+                streams.append((executor.submit(run, item, records), records))
+                # Hand the oldest item over once every worker is busy
+                if len(streams) > max_workers:
+                    yield from drain(*streams.popleft())
+
+            while streams:
+                yield from drain(*streams.popleft())
+        finally:
+            stopped.set()
+
+
+class FalconInventoryMixin:
+    """Rate limiting, caching and constructed inventory helpers shared by the Falcon inventory plugins.
+
+    Plugins provide _host_adder, returning a function that adds a host to inventory.
+    """
+
+    # Longest time to wait for the API rate limit to reset, in seconds
+    MAX_RATE_LIMIT_WAIT = 60
+    RATE_LIMIT_RETRIES = 5
+    # Options left out of the configuration hash, as rotating them does not change the inventory
+    CREDENTIAL_OPTIONS = ("client_id", "client_secret")
+
+    def __init__(self):
+        super().__init__()
+        self._rate_limit_lock = threading.Lock()
+        self._rate_limit_reset = 0.0
+        self._request_slots = None
+
+    def _call_api(self, method, **kwargs):
+        """Call a FalconPy method, honoring the API rate limit headers and max_workers."""
+        max_workers = max(self.get_option("max_workers"), 1)
+        with self._rate_limit_lock:
+            if self._request_slots is None:
+                # Workers started by other workers, such as member CIDs fetching pages, share the same limit
+                self._request_slots = threading.BoundedSemaphore(max_workers)
+
+        for _ in range(self.RATE_LIMIT_RETRIES):
+            # Wait for the rate limit window to reset if another request exhausted it
+            with self._rate_limit_lock:
+                delay = self._rate_limit_reset - time.time()
+            if delay > 0:
+                time.sleep(min(delay, self.MAX_RATE_LIMIT_WAIT))
+
+            with self._request_slots:
+                result = method(**kwargs)
+
+            headers = {key.lower(): value for key, value in (result.get("headers") or {}).items()}
+            remaining = headers.get("x-ratelimit-remaining")
+            rate_limited = result["status_code"] == 429
+            if rate_limited or (remaining is not None and int(remaining) < max_workers):
+                # X-Ratelimit-Retryafter is the epoch time at which the window resets
+                retry_after = headers.get("x-ratelimit-retryafter")
+                reset = float(retry_after) if retry_after else time.time() + 1
+                with self._rate_limit_lock:
+                    self._rate_limit_reset = max(self._rate_limit_reset, reset)
+
+            if not rate_limited:
+                return result
+
+        return result
+
+    def _add_fetched_hosts(self, host_details, cache_key, cache_constructed, cache_needs_update):
+        """Add hosts fetched from the API to inventory, caching them if needed."""
+        if cache_constructed:
+            constructed = self._construct_inventory(host_details)
+            if cache_needs_update:
+                self._cache[cache_key] = constructed
+        elif cache_needs_update:
+            self._add_and_cache_hosts(self._cache, cache_key, host_details)
+        else:
+            self._add_host_to_inventory(host_details)
+
+    def _get_record_cache(self, cache):
+        """Return the plugin of an inventory cache if it reads and writes hosts one by one, or None."""
+        # Cache plugins without records, such as jsonfile, hold every host in a single value
+        plugin = cache._plugin  # pylint: disable=protected-access
+        if hasattr(plugin, "iter_records") and hasattr(plugin, "set_records"):
+            return plugin
+
+        return None
+
+    def _iter_cached_hosts(self, cache, key):
+        """Return an iterator over cached hosts, raising KeyError if they are missing or expired."""
+        record_cache = self._get_record_cache(cache)
+        if record_cache:
+            return record_cache.iter_records(key)
+
+        return iter(cache[key])
+
+    def _add_host_to_inventory(self, host_details):
+        """Add hosts to inventory."""
+        add_host = self._host_adder()
+        for host in host_details:
+            add_host(host)
+
+    def _add_and_cache_hosts(self, cache, key, host_details):
+        """Add hosts to inventory, caching each one once added."""
+        add_host = self._host_adder()
+
+        def added_hosts():
+            for host in host_details:
+                add_host(host)
+                yield host
+
+        record_cache = self._get_record_cache(cache)
+        if record_cache:
+            # Hosts are written as they are added, without holding them all in memory
+            record_cache.set_records(key, added_hosts())
+        else:
+            cache[key] = list(added_hosts())
+
+    def _get_config_hash(self):
+        """Return a hash of the plugin configuration."""
+        options = {
+            option: self.get_option(option) for option in self._options if option not in self.CREDENTIAL_OPTIONS
+        }
+        # The member CID and cloud may also come from the environment
+        environment = {env: os.getenv(env) for env in ("FALCON_MEMBER_CID", "FALCON_CLOUD")}
+        config = json.dumps([options, environment], sort_keys=True, default=str)
+
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()[:16]
+
+    def _construct_inventory(self, host_details):
+        """Add hosts to inventory and return what was added, to be cached."""
+        recorder = InventoryRecorder(self.inventory)
+        self.inventory = recorder
+        try:
+            self._add_host_to_inventory(host_details)
+        finally:
+            self.inventory = recorder.inventory
+
+        return {"hosts": recorder.hosts, "groups": recorder.groups}
+
+    def _add_constructed_inventory(self, constructed):
+        """Add a cached constructed inventory."""
+        for hostname, hostvars in constructed["hosts"].items():
+            self.inventory.add_host(hostname)
+            for key, value in hostvars.items():
+                self.inventory.set_variable(hostname, key, value)
+
+        for group_name in constructed["groups"]:
+            self.inventory.add_group(group_name)
+        for group_name, children in constructed["groups"].items():
+            for child in children:
+                self.inventory.add_child(group_name, child)
+
+
+class InventoryRecorder:
+    """Forward calls to an inventory, recording the hosts, variables and groups added."""
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        # Variables are recorded as given, before the inventory tags them with their origin
+        self.hosts = {}
+        self.groups = {}
+
+    def __getattr__(self, name):
+        """Forward other attributes to the inventory."""
+        return getattr(self.inventory, name)
+
+    def add_host(self, host, group=None, port=None):
+        """Add a host."""
+        host = self.inventory.add_host(host, group, port)
+        self.hosts.setdefault(host, {})
+        if group:
+            self.groups.setdefault(group, []).append(host)
+
+        return host
+
+    def add_group(self, group):
+        """Add a group."""
+        group = self.inventory.add_group(group)
+        self.groups.setdefault(group, [])
+
+        return group
+
+    def add_child(self, group, child):
+        """Add a host or a group to a group."""
+        changed = self.inventory.add_child(group, child)
+        self.groups.setdefault(group, []).append(child)
+
+        return changed
+
+    def set_variable(self, entity, varname, value):
+        """Set a host or group variable."""
+        self.inventory.set_variable(entity, varname, value)
+        if entity in self.hosts:
+            self.hosts[entity][varname] = value
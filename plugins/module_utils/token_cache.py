@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# OAuth2 token cache shared by the FalconPy modules and plugins.
+# Copyright: (c) 2025, CrowdStrike Inc.
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+FALCONPY_IMPORT_ERROR = None
+
+try:
+    from falconpy import OAuth2
+except (ImportError, ModuleNotFoundError) as e:
+    FALCONPY_IMPORT_ERROR = e
+
+__metaclass__ = type
+
+# Only reuse tokens that remain valid long enough for the task using them to finish
+TOKEN_REUSE_MARGIN = 300
+
+CREDENTIAL_KEYS = ("client_id", "client_secret", "member_cid")
+
+
+def cached_token_credentials(creds):
+    """Replace client credentials with a cached access token if the token cache is enabled."""
+    # Path of the file holding the cached tokens, the cache is disabled if it is not set
+    path = os.getenv("FALCON_TOKEN_CACHE")
+    if not path or FALCONPY_IMPORT_ERROR or not creds.get("client_id") or not creds.get("client_secret"):
+        return creds
+
+    try:
+        token = get_cached_token(path, creds)
+    except OSError:
+        # The cache can't be used, so let FalconPy authenticate as usual
+        return creds
+
+    if not token:
+        return creds
+
+    token_creds = {key: value for key, value in creds.items() if key not in CREDENTIAL_KEYS}
+    token_creds.update(access_token=token["access_token"], base_url=token["base_url"])
+
+    return token_creds
+
+
+def get_cached_token(path, creds):
+    """Return the cached token of a set of credentials, generating a new one if needed."""
+    key = token_cache_key(creds)
+
+    # Keep the lock while generating a token, so other processes wait for it instead of generating their own
+    lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+
+        tokens = read_token_cache(path)
+        now = time.time()
+        token = tokens.get(key)
+        if token and token["expires_at"] - TOKEN_REUSE_MARGIN > now:
+            return token
+
+        token = generate_token(creds)
+        if token:
+            tokens = {k: v for k, v in tokens.items() if v["expires_at"] > now}
+            tokens[key] = token
+            write_token_cache(path, tokens)
+
+        return token
+    finally:
+        os.close(lock_fd)
+
+
+def token_cache_key(creds):
+    """Return the cache key of a set of credentials."""
+    fields = [creds.get(key) or "" for key in ("client_id", "client_secret", "base_url", "member_cid")]
+
+    return hashlib.sha256("\0".join(fields).encode("utf-8")).hexdigest()
+
+
+def generate_token(creds):
+    """Generate a new OAuth2 token, returning None if authentication fails."""
+    auth_keys = CREDENTIAL_KEYS + ("base_url", "user_agent")
+    falcon = OAuth2(**{key: value for key, value in creds.items() if key in auth_keys})
+
+    result = falcon.login()
+    if result["status_code"] != 201:
+        return None
+
+    return {
+        "access_token": result["body"]["access_token"],
+        # The cloud may have been autodiscovered
+        "base_url": falcon.base_url,
+        "expires_at": time.time() + result["body"]["expires_in"],
+    }
+
+
+def read_token_cache(path):
+    """Read the cached tokens."""
+    try:
+        with open(path, encoding="utf-8") as cache_file:
+            tokens = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+    return tokens if isinstance(tokens, dict) else {}
+
+
+def write_token_cache(path, tokens):
+    """Write the cached tokens to a file only readable by the current user."""
+    # mkstemp creates the file with 0600 permissions, and replacing the cache keeps it whole for readers
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".falcon_token_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+            json.dump(tokens, cache_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,350 @@
+"""Unit tests for the eventstream event source plugin."""
+import asyncio
+import importlib.util
+import json
+import threading
+import time
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from typing import ClassVar, Optional
+
+import pytest
+from aiohttp import web
+
+EDA = Path(__file__).resolve().parents[3] / "extensions" / "eda"
+PLUGIN = EDA / "plugins" / "event_source" / "eventstream.py"
+STUB = EDA / "benchmark" / "falcon_stub.py"
+
+
+def load_module(name: str, path: Path) -> ModuleType:
+    """Load a module from the source tree."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(name="eventstream", scope="module")
+def fixture_eventstream() -> ModuleType:
+    """Return the eventstream plugin module."""
+    return load_module("eventstream", PLUGIN)
+
+
+@pytest.fixture(name="falcon_stub", scope="module")
+def fixture_falcon_stub() -> ModuleType:
+    """Return the module of the local Falcon API stand-in used by the benchmark."""
+    return load_module("falcon_stub", STUB)
+
+
+def make_event(event_type: str, offset: int, event: Optional[dict] = None) -> dict:
+    """Build a raw event as sent by the data feed."""
+    return {
+        "metadata": {"customerIDString": "cid", "offset": offset, "eventType": event_type},
+        "event": event or {},
+    }
+
+
+def make_stream(eventstream: ModuleType, chunks: list[bytes], **kwargs: object) -> object:
+    """Build a stream partition reading chunks instead of an HTTP data feed."""
+    resource = {
+        "dataFeedURL": "http://127.0.0.1/stream?appId=test&partition=0",
+        "sessionToken": {"token": "session"},
+        "refreshActiveSessionURL": "http://127.0.0.1/sensors/entities/datafeed-actions/v1/0",
+        "refreshActiveSessionInterval": 1800,
+    }
+    client = SimpleNamespace(session=None, stream_session=None)
+    stream = eventstream.Stream(client, "test", None, False, [], resource, **kwargs)
+
+    async def iter_any():
+        for chunk in chunks:
+            yield chunk
+
+    async def open_stream():
+        stream.spigot = SimpleNamespace(content=SimpleNamespace(iter_any=iter_any))
+        return stream.spigot
+
+    stream.open_stream = open_stream
+    return stream
+
+
+def encode(*events: dict) -> bytes:
+    """Encode events as a chunk of NDJSON lines."""
+    return b"".join(json.dumps(event).encode() + b"\n" for event in events)
+
+
+async def read_events(stream: object, event_filter: object, checkpoints: object = None) -> list[dict]:
+    """Read every event of a stream."""
+    return [event async for event in stream.stream_events(event_filter, checkpoints)]
+
+
+def test_checkpoint_advances_past_filtered_chunk(eventstream: ModuleType, tmp_path: Path) -> None:
+    """A chunk whose events are all filtered out still moves the checkpoint forward."""
+    chunks = [
+        encode(make_event("DetectionSummaryEvent", 1)),
+        encode(make_event("AuthActivityAuditEvent", 2), make_event("AuthActivityAuditEvent", 3)),
+    ]
+    stream = make_stream(eventstream, chunks)
+    event_filter = eventstream.EventFilter(["AuthActivityAuditEvent"], [], [])
+    checkpoints = eventstream.FileCheckpointStore(str(tmp_path / "checkpoints.json"))
+
+    events = asyncio.run(read_events(stream, event_filter, checkpoints))
+    asyncio.run(checkpoints.flush())
+
+    assert [event["falcon"]["metadata"]["offset"] for event in events] == [1]
+    assert checkpoints.load("test", "0") == 3
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_checkpoint_store_round_trip(eventstream: ModuleType, tmp_path: Path, backend: str) -> None:
+    """Stored checkpoints are read back, merged with existing ones."""
+    path = str(tmp_path / "checkpoints")
+    store_class = eventstream.CHECKPOINT_BACKENDS[backend]
+
+    async def write() -> None:
+        store = store_class(path)
+        await store.commit("test", "0", 10)
+        await store.flush()
+        await store.commit("test", "1", 20)
+        await store.close()
+
+    asyncio.run(write())
+
+    assert store_class(path).load("test", "0") == 10
+    assert store_class(path).load("test", "1") == 20
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_checkpoints_written_off_the_event_loop(eventstream: ModuleType) -> None:
+    """Checkpoints are written from a worker thread while the event loop keeps running."""
+    with pytest.raises(TypeError):
+        eventstream.CheckpointStore("unused")
+
+    class SlowStore(eventstream.CheckpointStore):
+        writes: ClassVar[list] = []
+
+        def _read(self) -> dict:
+            return {}
+
+        def _write(self, offsets: dict) -> None:
+            time.sleep(0.2)
+            self.writes.append((threading.get_ident(), offsets))
+
+    async def flush_while_ticking() -> int:
+        store = SlowStore("unused", flush_events=1)
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.gather(store.commit("test", "0", 1), store.commit("test", "1", 2))
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(flush_while_ticking()) > 10
+    assert [offsets for _, offsets in SlowStore.writes] == [{("test", "0"): 1}, {("test", "1"): 2}]
+    assert threading.get_ident() not in {thread for thread, _ in SlowStore.writes}
+
+
+def test_prefilter_ignores_payload_keys(eventstream: ModuleType) -> None:
+    """Event types and offsets in the event payload are not mistaken for the metadata ones."""
+    decoy = make_event(
+        "DetectionSummaryEvent",
+        5,
+        {
+            "eventType": "AuthActivityAuditEvent",
+            "offset": 99,
+            "metadata": {"eventType": "AuthActivityAuditEvent"},
+            "CommandLine": '"eventType": "AuthActivityAuditEvent"',
+        },
+    )
+    excluded = make_event("AuthActivityAuditEvent", 6, {"metadata": {"eventType": "DetectionSummaryEvent", "offset": 98}})
+    # Without the metadata object first, the line is left to the full decode
+    payload_first = {
+        "event": {"eventType": "AuthActivityAuditEvent", "offset": 97},
+        "metadata": {"customerIDString": "cid", "offset": 7, "eventType": "DetectionSummaryEvent"},
+    }
+    event_filter = eventstream.EventFilter(["AuthActivityAuditEvent"], [], [])
+    lines = eventstream.EventDecoder().split(encode(decoy, excluded, payload_first))
+
+    kept, skipped_offset = event_filter.prefilter(lines)
+
+    assert [json.loads(bytes(line))["metadata"]["offset"] for line in kept] == [5, 7]
+    assert skipped_offset == 6
+
+    # A nested object in the metadata could hold other keys, so the line is left to the full decode
+    nested = {"metadata": {"x": {"eventType": "AuthActivityAuditEvent"}, "eventType": "DetectionSummaryEvent", "offset": 9}}
+    assert len(event_filter.prefilter(eventstream.EventDecoder().split(encode(nested)))[0]) == 1
+
+    stream = make_stream(eventstream, [encode(decoy, excluded, payload_first, make_event("AuthActivityAuditEvent", 8))])
+    events = asyncio.run(read_events(stream, event_filter))
+    assert [event["falcon"]["metadata"]["offset"] for event in events] == [5, 7]
+    assert stream.offset == 8
+
+
+def test_received_events_are_counted_once(eventstream: ModuleType) -> None:
+    """Every received event is counted once as emitted, filtered or deduplicated."""
+    # Without the metadata object first, the excluded event is only filtered once decoded
+    decoded_excluded = {"event": {}, "metadata": {"offset": 3, "eventType": "AuthActivityAuditEvent"}}
+    chunks = [
+        encode(make_event("DetectionSummaryEvent", 1, {"id": "a"}), make_event("AuthActivityAuditEvent", 2)),
+        encode(decoded_excluded, make_event("DetectionSummaryEvent", 4, {"id": "a"})),
+        encode(make_event("DetectionSummaryEvent", 5, {"id": "b"})),
+    ]
+    metrics = eventstream.Metrics()
+    stream = make_stream(eventstream, chunks, metrics=metrics)
+    event_filter = eventstream.EventFilter(["AuthActivityAuditEvent"], [], [])
+    dedup = eventstream.Deduplicator(["event.id"])
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def send_events() -> None:
+        flow = eventstream.FlowControl(queue)
+        async for event in stream.stream_events(event_filter):
+            await eventstream.send_event(stream, flow, event, dedup)
+
+    asyncio.run(send_events())
+
+    def total(name: str) -> float:
+        return sum(metrics.samples[name].values())
+
+    assert queue.qsize() == 2
+    assert total("events_received_total") == 5
+    assert total("events_emitted_total") == 2
+    assert total("events_filtered_total") == 2
+    assert total("events_deduplicated_total") == 1
+    assert total("events_received_total") == (
+        total("events_emitted_total") + total("events_filtered_total") + total("events_deduplicated_total")
+    )
+
+
+def test_aggregated_events_are_counted_once_sent(eventstream: ModuleType) -> None:
+    """Held events are counted as emitted when sent, and only their later duplicates as deduplicated."""
+    chunks = [
+        encode(
+            make_event("DetectionSummaryEvent", 1, {"id": "a"}),
+            make_event("DetectionSummaryEvent", 2, {"id": "a"}),
+            make_event("DetectionSummaryEvent", 3, {"id": "b"}),
+            make_event("DetectionSummaryEvent", 4),
+        ),
+    ]
+    metrics = eventstream.Metrics()
+    stream = make_stream(eventstream, chunks, metrics=metrics)
+    dedup = eventstream.Deduplicator(["event.id"], mode="aggregate")
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def total(name: str) -> float:
+        return sum(metrics.samples[name].values())
+
+    async def send_events() -> None:
+        flow = eventstream.FlowControl(queue)
+        async for event in stream.stream_events(eventstream.EventFilter([], [], [])):
+            await eventstream.send_event(stream, flow, event, dedup)
+        # Only the event without the dedup field was sent so far
+        assert queue.qsize() == total("events_emitted_total") == 1
+        await eventstream.send_released(dedup, flow, flush=True)
+
+    asyncio.run(send_events())
+
+    events = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert [(event["falcon"]["metadata"]["offset"], event.get("dedup", {}).get("count")) for event in events] == [
+        (4, None),
+        (1, 2),
+        (3, 1),
+    ]
+    assert total("events_emitted_total") == len(events)
+    assert total("events_deduplicated_total") == 1
+    assert total("events_received_total") == total("events_emitted_total") + total("events_deduplicated_total")
+
+
+def test_projection_keeps_tenant_cid(eventstream: ModuleType) -> None:
+    """Tenants without a member CID read it from events whose other metadata is dropped."""
+    event = make_event("DetectionSummaryEvent", 1, {"Severity": 3, "CommandLine": "cmd"})
+    event["metadata"]["eventCreationTime"] = 1_000
+    metrics = eventstream.Metrics()
+    projection = eventstream.EventProjection(["event.Severity"], [])
+    stream = make_stream(eventstream, [encode(event)], metrics=metrics, projection=projection, tenant="child")
+
+    events = asyncio.run(read_events(stream, eventstream.EventFilter([], [], [])))
+
+    assert events == [
+        {
+            "falcon": {
+                "metadata": {
+                    "customerIDString": "cid",
+                    "offset": 1,
+                    "eventType": "DetectionSummaryEvent",
+                    "eventCreationTime": 1_000,
+                },
+                "event": {"Severity": 3},
+            },
+            "cid": "cid",
+        },
+    ]
+    assert metrics.samples["lag_seconds"]
+
+
+async def run_with_stub(eventstream: ModuleType, stub: object, args: dict, until: object) -> None:
+    """Run the plugin against a local Falcon API stand-in until a condition is met."""
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    eventstream.REGIONS["test"] = f"http://127.0.0.1:{port}"
+    args = {"falcon_client_id": "id", "falcon_client_secret": "secret", "falcon_cloud": "test", **args}
+    plugin = asyncio.create_task(eventstream.main(asyncio.Queue(), args))
+
+    async def wait() -> None:
+        while not until() and not plugin.done():
+            await asyncio.sleep(0.05)
+
+    try:
+        await asyncio.wait_for(wait(), 10)
+        if plugin.done():
+            plugin.result()
+    finally:
+        plugin.cancel()
+        await asyncio.gather(plugin, return_exceptions=True)
+        await runner.cleanup()
+
+
+def test_connection_limit_below_partitions(eventstream: ModuleType, falcon_stub: ModuleType) -> None:
+    """A connection limit lower than the number of partitions is rejected on startup."""
+    stub = falcon_stub.FalconStub(partitions=3)
+
+    with pytest.raises(ValueError, match="connection_limit"):
+        asyncio.run(run_with_stub(eventstream, stub, {"connection_limit": 2}, lambda: False))
+
+
+def test_refresh_not_starved_by_streams(eventstream: ModuleType, falcon_stub: ModuleType) -> None:
+    """Sessions are refreshed while every partition holds a stream connection."""
+    # Refresh each partition a second after it starts
+    stub = falcon_stub.FalconStub(partitions=3, refresh_interval=eventstream.Stream.REFRESH_MARGIN + 1)
+
+    asyncio.run(run_with_stub(eventstream, stub, {"connection_limit": 3}, lambda: stub.stats["refreshes"] >= 3))
+
+    assert stub.stats["connections"] == 3
+    assert stub.stats["refreshes"] >= 3
+
+
+def test_metrics_port_in_use_leaves_no_tasks(eventstream: ModuleType, falcon_stub: ModuleType, tmp_path: Path) -> None:
+    """A metrics port already in use stops the plugin before any partition starts."""
+    stub = falcon_stub.FalconStub(partitions=2)
+
+    async def run() -> set:
+        taken = web.AppRunner(web.Application())
+        await taken.setup()
+        await web.TCPSite(taken, "127.0.0.1", 0).start()
+        args = {"metrics_port": taken.addresses[0][1], "checkpoint_path": str(tmp_path / "checkpoints.json")}
+        try:
+            with pytest.raises(OSError):
+                await run_with_stub(eventstream, stub, args, lambda: False)
+        finally:
+            await taken.cleanup()
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert not asyncio.run(run())
+    assert stub.stats["connections"] == 0
@@ -0,0 +1,56 @@
+"""Unit tests for the msgpackfile cache plugin."""
+import os
+
+import pytest
+from ansible.errors import AnsibleError
+from ansible.plugins.inventory import get_cache_plugin
+
+pytest.importorskip("msgpack")
+
+# Random values do not compress, so the file is larger than what is read at once
+HOSTS = [{"device_id": f"d{i}", "hostname": f"h{i}", "serial": os.urandom(1024).hex()} for i in range(2000)]
+
+
+def load_plugin(path):
+    """Load the cache plugin storing its files in a directory."""
+    return get_cache_plugin("crowdstrike.falcon.msgpackfile", _uri=str(path))._plugin
+
+
+def write_truncated(path, fraction):
+    """Cache the hosts, keeping only a fraction of the file, and return the file name."""
+    plugin = load_plugin(path)
+    plugin.set_records("hosts", iter(HOSTS))
+    cachefile = plugin._get_cache_file_name("hosts")
+    with open(cachefile, "rb+") as stream:
+        stream.truncate(int(os.path.getsize(cachefile) * fraction))
+
+    return cachefile
+
+
+def test_records_round_trip(tmp_path):
+    """Records are read back in the order they were written."""
+    load_plugin(tmp_path).set_records("hosts", iter(HOSTS))
+
+    assert list(load_plugin(tmp_path).iter_records("hosts")) == HOSTS
+
+
+def test_corrupt_header_is_a_cache_miss(tmp_path):
+    """A file whose header cannot be read is removed before any record is returned."""
+    cachefile = write_truncated(tmp_path, 0.001)
+
+    with pytest.raises(KeyError):
+        load_plugin(tmp_path).iter_records("hosts")
+
+    assert not os.path.exists(cachefile)
+
+
+def test_truncated_records_remove_the_file(tmp_path):
+    """A file truncated after some records is removed once the truncation is reached."""
+    cachefile = write_truncated(tmp_path, 0.5)
+
+    records = load_plugin(tmp_path).iter_records("hosts")
+    with pytest.raises(AnsibleError, match="re-run"):
+        for record in records:
+            assert record["hostname"]
+
+    assert not os.path.exists(cachefile)
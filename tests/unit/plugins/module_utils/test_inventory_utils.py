@@ -0,0 +1,150 @@
+"""Unit tests for the helpers shared by the Falcon inventory plugins."""
+import threading
+import time
+
+import pytest
+from ansible.plugins.inventory import get_cache_plugin
+from ansible_collections.crowdstrike.falcon.plugins.module_utils.inventory_utils import (
+    FalconInventoryMixin,
+    fetch_pages,
+    stream_records,
+)
+
+HOSTS = [{"device_id": f"d{i}", "hostname": f"h{i}", "tags": ["x"]} for i in range(5)]
+
+# Cache plugins that stream hosts as records, and plugins that hold them in a single value
+RECORD_CACHE = "crowdstrike.falcon.msgpackfile"
+VALUE_CACHE = "ansible.builtin.jsonfile"
+
+
+class Inventory(FalconInventoryMixin):
+    """Record the hosts added to inventory."""
+
+    def __init__(self, max_workers=4):
+        super().__init__()
+        self.added = []
+        self.options = {"max_workers": max_workers}
+
+    def get_option(self, option):
+        return self.options[option]
+
+    def _host_adder(self):
+        return self.added.append
+
+
+def load_cache(plugin_name, path):
+    """Load an inventory cache storing its files in a directory."""
+    return get_cache_plugin(plugin_name, _uri=str(path))
+
+
+def test_record_cache_streams_hosts(tmp_path):
+    """Hosts are written and read one by one by cache plugins supporting records."""
+    pytest.importorskip("msgpack")
+    inventory = Inventory()
+    cache = load_cache(RECORD_CACHE, tmp_path)
+    assert inventory._get_record_cache(cache) is not None
+
+    inventory._add_and_cache_hosts(cache, "hosts", iter(HOSTS))
+
+    assert inventory.added == HOSTS
+    # The hosts were written to the file as they were added, not held in memory
+    assert "hosts" not in cache._cache
+    assert list(inventory._iter_cached_hosts(load_cache(RECORD_CACHE, tmp_path), "hosts")) == HOSTS
+
+
+def test_value_cache_stores_host_list(tmp_path):
+    """Cache plugins without records store the hosts through the regular cache API."""
+    inventory = Inventory()
+    cache = load_cache(VALUE_CACHE, tmp_path)
+    assert inventory._get_record_cache(cache) is None
+
+    inventory._add_and_cache_hosts(cache, "hosts", iter(HOSTS))
+    cache.update_cache_if_changed()
+
+    assert inventory.added == HOSTS
+    assert cache["hosts"] == HOSTS
+    assert list(inventory._iter_cached_hosts(load_cache(VALUE_CACHE, tmp_path), "hosts")) == HOSTS
+
+
+@pytest.mark.parametrize("plugin_name", [RECORD_CACHE, VALUE_CACHE])
+def test_missing_cached_hosts(tmp_path, plugin_name):
+    """Reading hosts that were never cached raises KeyError."""
+    if plugin_name == RECORD_CACHE:
+        pytest.importorskip("msgpack")
+
+    with pytest.raises(KeyError):
+        Inventory()._iter_cached_hosts(load_cache(plugin_name, tmp_path), "hosts")
+
+
+def test_stream_records_keeps_item_order():
+    """Records of items produced in parallel are yielded in the order of the items."""
+    def produce(item):
+        # Later items finish first
+        time.sleep(0.01 * (5 - item))
+        for index in range(3):
+            yield (item, index)
+
+    records = list(stream_records(produce, range(5), max_workers=3, buffer_size=1))
+
+    assert records == [(item, index) for item in range(5) for index in range(3)]
+
+
+def test_stream_records_raises_worker_errors():
+    """An error raised while producing an item is raised when its records are read."""
+    def produce(item):
+        yield item
+        if item == 1:
+            raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        list(stream_records(produce, range(4), max_workers=2, buffer_size=1))
+
+
+def test_stream_records_stops_workers():
+    """Workers waiting to hand records over stop once the records are no longer read."""
+    def produce(item):
+        yield from range(100)
+
+    records = stream_records(produce, range(4), max_workers=4, buffer_size=1)
+    assert next(records) == 0
+    records.close()
+
+
+def test_call_api_bounds_nested_requests():
+    """Requests of nested workers never exceed max_workers in total."""
+    inventory = Inventory(max_workers=2)
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def request():
+        with lock:
+            active.append(None)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.pop()
+        return {"status_code": 200, "body": {"resources": [None]}}
+
+    def fetch_page(_page):
+        return inventory._call_api(request)["body"]["resources"]
+
+    def produce(_item):
+        return fetch_pages(fetch_page, range(4), max_workers=2)
+
+    records = list(stream_records(produce, range(4), max_workers=2, buffer_size=1))
+
+    assert len(records) == 16
+    assert max(peak) <= 2
+
+
+def test_config_hash_ignores_credentials():
+    """Rotating the API credentials keeps the configuration hash, other options change it."""
+    def config_hash(**options):
+        inventory = Inventory()
+        inventory.options.update({"client_id": "id", "client_secret": "secret", "filter": "", **options})
+        inventory._options = inventory.options
+        return inventory._get_config_hash()
+
+    assert config_hash() == config_hash(client_id="other", client_secret="rotated")
+    assert config_hash() != config_hash(filter="platform_name:'Linux'")